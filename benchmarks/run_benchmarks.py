@@ -0,0 +1,379 @@
+"""
+Offline benchmark suite, on synthetic NanoAOD files read through a local (file://) redirector
+stand-in. Run from the repository root:
+
+    python benchmarks/run_benchmarks.py [--n-events 1000000] [--max-workers 8]
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<other commit>.json
+
+Results are written to benchmarks/results/<git commit>.json so they can be compared between
+commits.
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+import typer
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+sys.path.insert(0, str(REPO / "benchmarks"))
+
+from synthetic import write_synthetic_nanoaod  # noqa: E402
+
+RESULTS_DIR = REPO / "benchmarks" / "results"
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def timeit(func: Callable[[], Any], repeat: int) -> dict[str, float]:
+    """
+    Wall times of `repeat` calls (stdout of func is discarded).
+    """
+    times = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+
+    return {
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "max_s": max(times),
+        "repeat": repeat,
+    }
+
+
+def peak_memory_mb(func: Callable[[], Any]) -> float:
+    """
+    Peak of the memory allocated (numpy buffers included) during one call of func, in MB.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return peak / 1e6
+
+
+def synthetic_dataset(lfns: list[str] | None = None):
+    from lepton_zoo import (
+        Dataset,
+        DatasetType,
+        LHCRun,
+        NanoADODVersion,
+        ProcessGroup,
+        Year,
+    )
+
+    return Dataset.model_construct(
+        das_names=["/Synthetic/Benchmark-NANOv15/NANOAODSIM"],
+        process_name="Synthetic",
+        process_group=ProcessGroup.DRELL_YAN,
+        year=Year.RunSummer24,
+        nanoadod_version=NanoADODVersion.V15,
+        lhc_run=LHCRun.Run3,
+        dataset_type=DatasetType.BACKGROUND,
+        xsec=1.0,
+        filter_eff=1.0,
+        k_factor=1.0,
+        lfns=lfns,
+        generator_filter=None,
+    )
+
+
+def bench_load_file(path: Path, repeat: int) -> dict[str, Any]:
+    from lepton_zoo.events import load_file
+
+    return timeit(lambda: load_file(str(path), False), repeat)
+
+
+def bench_build_events(path: Path, n_events: int, repeat: int) -> dict[str, Any]:
+    from lepton_zoo.events import Events, available_branches, load_file
+
+    result = timeit(lambda: Events.build_events(str(path), False), repeat)
+    result["events_per_s"] = n_events / result["min_s"]
+    result["peak_mb"] = peak_memory_mb(lambda: Events.build_events(str(path), False))
+
+    # building the collections alone, from branches already read
+    tree = load_file(str(path), False)
+    arrays = tree.arrays(available_branches(tree))
+    result["build_peak_mb"] = peak_memory_mb(
+        lambda: Events.from_arrays(str(path), arrays)
+    )
+    return result
+
+
+def bench_run_classification(path: Path, n_events: int, repeat: int) -> dict[str, Any]:
+    from lepton_zoo import run_classification
+
+    dataset = synthetic_dataset()
+    result = timeit(lambda: run_classification(str(path), dataset, True, False), repeat)
+    result["events_per_s"] = n_events / result["min_s"]
+    return result
+
+
+def bench_preselection(work_dir: Path, n_events: int, repeat: int) -> dict[str, Any]:
+    from lepton_zoo import run_classification
+    from lepton_zoo.events import Events
+    from lepton_zoo.preselection import Preselection
+
+    # NanoAOD sized clusters and a rare (multilepton signal region like, < 0.1% of the events)
+    # selection, so that about half of the clusters hold no passing event and are not read
+    path = write_synthetic_nanoaod(
+        work_dir / "preselection.root", n_events, seed=7, chunk_size=1_000
+    )
+    preselection = Preselection(min_leptons=7)
+    dataset = synthetic_dataset()
+
+    result: dict[str, Any] = {}
+    for name, selection in [("all", None), ("preselected", preselection)]:
+        result[name] = timeit(
+            lambda: run_classification(
+                str(path), dataset, True, False, preselection=selection
+            ),
+            repeat,
+        )
+        bytes_read = bytes_skipped = n_passing = 0
+        for events in Events.iterate_events(str(path), False, preselection=selection):
+            events.materialize()
+            bytes_read += events.bytes_read
+            bytes_skipped += events.bytes_skipped
+            n_passing += events.n_passing or 0
+        result[name].update(
+            bytes_read=bytes_read, bytes_skipped=bytes_skipped, n_passing=n_passing
+        )
+
+    if result["preselected"]["bytes_skipped"] <= 0:
+        raise RuntimeError("The preselection benchmark did not skip any cluster")
+    result["speedup"] = result["all"]["min_s"] / result["preselected"]["min_s"]
+    return result
+
+
+def bench_catalog(
+    work_dir: Path, n_datasets: int, n_lfns: int, repeat: int
+) -> dict[str, Any]:
+    from lepton_zoo import Dataset
+    from lepton_zoo.catalog import Catalog, write_catalog
+
+    datasets = []
+    for i in range(n_datasets):
+        dataset = synthetic_dataset(
+            [f"/store/mc/Synthetic{i}/NANOAODSIM/{j:06d}.root" for j in range(n_lfns)]
+        )
+        dataset.process_name = f"Synthetic{i}"
+        datasets.append(dataset)
+
+    json_path = work_dir / "catalog_bench.json"
+    json_path.write_text(json.dumps([d.model_dump(mode="json") for d in datasets]))
+    catalog_path = work_dir / "catalog_bench.lzcat"
+    write_catalog(datasets, catalog_path)
+
+    def json_lookup():
+        parsed = [
+            Dataset.model_validate(obj) for obj in json.loads(json_path.read_text())
+        ]
+        for d in parsed:
+            if d.process_name == f"Synthetic{n_datasets - 1}":
+                return d.lfns[n_lfns // 2]
+
+    def catalog_lookup():
+        catalog = Catalog(catalog_path)
+        catalog.dataset(f"Synthetic{n_datasets - 1}", "RunSummer24")
+        return catalog.lfn(f"Synthetic{n_datasets - 1}", "RunSummer24", n_lfns // 2)
+
+    return {
+        "n_datasets": n_datasets,
+        "n_lfns": n_lfns,
+        "json_validate_and_scan": timeit(json_lookup, repeat),
+        "catalog_lookup": timeit(catalog_lookup, repeat),
+    }
+
+
+def bench_run_parallel(
+    work_dir: Path, path: Path, n_files: int, n_events: int, max_workers: int
+) -> dict[str, Any]:
+    from lepton_zoo.catalog import write_catalog
+    from lepton_zoo.executor import WorkItem, run_worker_pool
+
+    catalog_path = work_dir / "parallel_bench.lzcat"
+    write_catalog([synthetic_dataset([str(path)] * n_files)], catalog_path)
+    items = [
+        WorkItem(seq=i + 1, process_name="Synthetic", year="RunSummer24", file_index=i)
+        for i in range(n_files)
+    ]
+
+    scaling = {}
+    n_workers = 1
+    while n_workers <= max_workers:
+        result = timeit(
+            lambda: run_worker_pool(
+                items,
+                catalog_path,
+                n_workers=n_workers,
+                results_dir=work_dir / "parallel_outputs",
+                joblog=work_dir / "joblog.tsv",
+            ),
+            1,
+        )
+        result["events_per_s"] = n_files * n_events / result["min_s"]
+        scaling[str(n_workers)] = result
+        n_workers *= 2
+
+    return {"n_files": n_files, "scaling": scaling}
+
+
+def compare(
+    current: dict[str, Any], reference: dict[str, Any], prefix: str = ""
+) -> None:
+    """
+    Print current/reference ratio of every matching min_s and peak memory.
+    """
+    for key, value in current.items():
+        if key not in reference:
+            continue
+        if isinstance(value, dict):
+            compare(value, reference[key], f"{prefix}{key}.")
+        elif key == "min_s" and reference[key] > 0:
+            ratio = value / reference[key]
+            print(f"{prefix[:-1]:<55} {value:9.4f} s  x{ratio:5.2f} vs reference")
+        elif key.endswith("peak_mb") and reference[key] > 0:
+            ratio = value / reference[key]
+            print(f"{prefix + key:<55} {value:9.1f} MB x{ratio:5.2f} vs reference")
+
+
+def run_all(
+    work_dir: Path,
+    n_events: int,
+    repeat: int,
+    max_workers: int,
+    n_files: int,
+    catalog_datasets: int,
+    catalog_lfns: int,
+) -> dict[str, Any]:
+    """
+    All benchmarks, on synthetic files written to work_dir.
+    """
+    path = work_dir / "synthetic.root"
+    start = time.perf_counter()
+    write_synthetic_nanoaod(path, n_events)
+    print(
+        f"Synthetic file: {n_events} events, {path.stat().st_size / 1e6:.1f} MB ({time.perf_counter() - start:.1f} s)"
+    )
+
+    results: dict[str, Any] = {
+        "commit": git_commit(),
+        "time": time.time(),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "n_events": n_events,
+        "file_size": path.stat().st_size,
+        "benchmarks": {},
+    }
+    benchmarks = results["benchmarks"]
+
+    benchmarks["load_file"] = bench_load_file(path, repeat)
+    benchmarks["build_events"] = bench_build_events(path, n_events, repeat)
+    benchmarks["run_classification"] = bench_run_classification(path, n_events, repeat)
+    benchmarks["preselection"] = bench_preselection(work_dir, n_events, repeat)
+    benchmarks["catalog"] = bench_catalog(
+        work_dir, catalog_datasets, catalog_lfns, repeat
+    )
+    benchmarks["run_parallel"] = bench_run_parallel(
+        work_dir, path, n_files, n_events, max_workers
+    )
+
+    return results
+
+
+def main(
+    n_events: int = typer.Option(200_000, help="Events in the synthetic file."),
+    repeat: int = typer.Option(3, help="Repetitions of each benchmark."),
+    max_workers: int = typer.Option(
+        os.cpu_count() or 1, help="run_parallel scaling goes 1, 2, 4, ... up to this."
+    ),
+    n_files: int = typer.Option(
+        16, help="Files processed by the run_parallel benchmark."
+    ),
+    catalog_datasets: int = typer.Option(50, help="Datasets in the catalog benchmark."),
+    catalog_lfns: int = typer.Option(
+        20_000, help="LFNs per dataset in the catalog benchmark."
+    ),
+    output: Path | None = typer.Option(
+        None, help="Result file (default: benchmarks/results/<git commit>.json)."
+    ),
+    compare_to: Path | None = typer.Option(
+        None, "--compare", help="Previous result file to compare against."
+    ),
+):
+    # relative to where the benchmarks are started, not to the temporary working directory
+    if output is not None:
+        output = output.absolute()
+    reference = (
+        json.loads(compare_to.read_text(encoding="utf-8"))
+        if compare_to is not None
+        else None
+    )
+
+    cwd = Path.cwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        # local stand-in for the XRootD redirectors, isolated redirector stats
+        os.environ["LEPZOO_REDIRECTORS"] = "file://"
+        os.environ["LEPZOO_REDIRECTOR_STATS"] = str(work_dir / "redirector_stats.json")
+        os.chdir(work_dir)
+        try:
+            results = run_all(
+                work_dir,
+                n_events,
+                repeat,
+                max_workers,
+                n_files,
+                catalog_datasets,
+                catalog_lfns,
+            )
+        finally:
+            os.chdir(cwd)
+
+    print(json.dumps(results["benchmarks"], indent=2))
+
+    if output is None:
+        output = RESULTS_DIR / f"{results['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"Results written to {output}")
+
+    if reference is not None:
+        compare(results, reference)
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,140 @@
+"""
+Startup-time benchmark of the lepzoo CLI.
+
+Every `run-serial` job spawned by `run-parallel` pays the interpreter + import cost, so it is
+tracked against a budget. Run from the repository root:
+
+    python benchmarks/startup.py [--repeat 5] [--output startup.json]
+
+Exits with a non-zero code if any scenario is over budget or imports a forbidden module.
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import typer
+
+REPO = Path(__file__).resolve().parent.parent
+
+# scenario -> (python arguments, budget in seconds, modules that must not be imported)
+SCENARIOS: dict[str, tuple[list[str], float, list[str]]] = {
+    "list-processes": (
+        ["main.py", "list-processes", "--parsed-datasets-file", "{datasets}"],
+        0.5,
+        ["dbs", "uproot", "awkward", "vector"],
+    ),
+    "run-serial": (
+        # everything a run-serial job imports before it opens its file
+        ["-c", "import main; from lepton_zoo import run_classification"],
+        1.5,
+        ["dbs"],
+    ),
+}
+
+DUMMY_DATASET = {
+    "das_names": ["/Dummy/Run2024G-MINIv6NANOv15-v1/NANOAOD"],
+    "process_group": "Data",
+    "year": "RunSummer24",
+    "nanoadod_version": "v15",
+    "lhc_run": "Run3",
+    "dataset_type": "Data",
+    "xsec": 1.0,
+    "filter_eff": 1.0,
+    "k_factor": 1.0,
+    "lfns": ["/store/data/dummy.root"],
+}
+
+
+def parse_importtime(stderr: str) -> dict[str, tuple[int, bool]]:
+    """
+    Cumulative import time (us) of every imported module, and whether it was a top level import,
+    from `python -X importtime` output.
+    """
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        imports[name.strip()] = (int(cumulative), not name.startswith("  "))
+
+    return imports
+
+
+def run_scenario(
+    args: list[str], repeat: int
+) -> tuple[list[float], dict[str, tuple[int, bool]]]:
+    wall_times = []
+    imports = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", *args],
+            cwd=REPO,
+            capture_output=True,
+            text=True,
+        )
+        wall_times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"{args} failed:\n{result.stderr}")
+        imports = parse_importtime(result.stderr)
+
+    return wall_times, imports
+
+
+def main(
+    repeat: int = typer.Option(5, help="Number of runs per scenario."),
+    output: Path | None = typer.Option(None, help="Write results as JSON."),
+):
+    results = {}
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        datasets = Path(tmp) / "parsed_datasets.json"
+        datasets.write_text(json.dumps([DUMMY_DATASET]), encoding="utf-8")
+
+        for name, (args, budget, forbidden) in SCENARIOS.items():
+            args = [a.format(datasets=datasets) for a in args]
+            wall_times, imports = run_scenario(args, repeat)
+            median = statistics.median(wall_times)
+            bad_imports = [
+                f
+                for f in forbidden
+                if any(m == f or m.startswith(f"{f}.") for m in imports)
+            ]
+            top = sorted(
+                ((m, us) for m, (us, top_level) in imports.items() if top_level),
+                key=lambda kv: kv[1],
+                reverse=True,
+            )[:10]
+
+            print(
+                f"{name}: median {median * 1000:.0f} ms (budget {budget * 1000:.0f} ms)"
+            )
+            for module, us in top:
+                print(f"    {us / 1000:8.1f} ms  {module}")
+            if bad_imports:
+                print(f"    forbidden imports: {', '.join(bad_imports)}")
+
+            over_budget = median > budget or bool(bad_imports)
+            failed |= over_budget
+            results[name] = {
+                "median_s": median,
+                "wall_times_s": wall_times,
+                "budget_s": budget,
+                "top_imports_us": dict(top),
+                "forbidden_imports": bad_imports,
+                "over_budget": over_budget,
+            }
+
+    if output is not None:
+        output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    raise typer.Exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    typer.run(main)
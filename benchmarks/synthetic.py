@@ -0,0 +1,119 @@
+"""
+Synthetic NanoAOD writer, for offline benchmarks (no DBS, no XRootD, no ROOT: uproot only).
+
+    python benchmarks/synthetic.py synthetic.root --n-events 1000000
+
+The Events tree has the NanoAOD layout used by Events.build_events (nMuon + Muon_*, nElectron +
+Electron_*, nJet + Jet_*, PuppiMET_*, run/luminosityBlock/event) with roughly realistic jagged
+multiplicities and kinematics, and single lepton trigger bits (HLT_*) fired by the leading
+lepton. A Runs tree holds genEventSumw/genEventCount.
+"""
+
+from pathlib import Path
+
+import awkward as ak
+import numpy as np
+import typer
+import uproot
+
+# collection -> (mean multiplicity, fields)
+COLLECTIONS = {
+    "Muon": (0.8, ["pt", "eta", "phi", "charge"]),
+    "Electron": (0.6, ["pt", "eta", "phi", "mass", "charge"]),
+    "Jet": (4.5, ["pt", "eta", "phi", "mass"]),
+}
+MAX_ETA = {"Muon": 2.4, "Electron": 2.5, "Jet": 4.7}
+# trigger bit -> (collection, pt threshold)
+TRIGGERS = {"HLT_IsoMu24": ("Muon", 26.0), "HLT_Ele32_WPTight_Gsf": ("Electron", 34.0)}
+
+
+def _collection(rng: np.random.Generator, name: str, n_events: int) -> ak.Array:
+    mean, fields = COLLECTIONS[name]
+    counts = rng.poisson(mean, n_events)
+    n = int(counts.sum())
+
+    values = {
+        # falling spectrum above a few GeV
+        "pt": (3.0 + rng.exponential(25.0, n)).astype(np.float32),
+        "eta": rng.uniform(-MAX_ETA[name], MAX_ETA[name], n).astype(np.float32),
+        "phi": rng.uniform(-np.pi, np.pi, n).astype(np.float32),
+        "mass": np.abs(rng.normal(10.0 if name == "Jet" else 0.0005, 3.0, n)).astype(
+            np.float32
+        ),
+        "charge": rng.choice(np.array([-1, 1], dtype=np.int32), n),
+    }
+
+    return ak.zip({field: ak.unflatten(values[field], counts) for field in fields})
+
+
+def _chunk(
+    rng: np.random.Generator, first_event: int, n_events: int
+) -> dict[str, ak.Array | np.ndarray]:
+    chunk: dict[str, ak.Array | np.ndarray] = {}
+    for name in COLLECTIONS:
+        chunk[name] = _collection(rng, name, n_events)
+    for trigger, (name, threshold) in TRIGGERS.items():
+        chunk[trigger] = ak.to_numpy(ak.any(chunk[name].pt > threshold, axis=1))
+
+    chunk["PuppiMET_pt"] = rng.exponential(30.0, n_events).astype(np.float32)
+    chunk["PuppiMET_phi"] = rng.uniform(-np.pi, np.pi, n_events).astype(np.float32)
+    events = np.arange(first_event, first_event + n_events, dtype=np.uint64)
+    chunk["run"] = np.full(n_events, 385_000, dtype=np.uint32)
+    chunk["luminosityBlock"] = (events // 1000 + 1).astype(np.uint32)
+    chunk["event"] = events
+    chunk["genWeight"] = rng.normal(1.0, 0.1, n_events).astype(np.float32)
+
+    return chunk
+
+
+def write_synthetic_nanoaod(
+    path: Path,
+    n_events: int,
+    seed: int = 42,
+    chunk_size: int = 100_000,
+) -> Path:
+    """
+    Write n_events synthetic events to path, chunk_size events (one basket) at a time.
+    """
+    rng = np.random.default_rng(seed)
+    sum_w = 0.0
+    with uproot.recreate(path) as f:
+        tree = None
+        for first_event in range(0, n_events, chunk_size):
+            chunk = _chunk(rng, first_event, min(chunk_size, n_events - first_event))
+            sum_w += float(np.sum(chunk["genWeight"]))
+            if tree is None:
+                tree = f.mktree(
+                    "Events",
+                    {
+                        k: (v.type.content if isinstance(v, ak.Array) else v.dtype)
+                        for k, v in chunk.items()
+                    },
+                    counter_name=lambda counted: f"n{counted}",
+                    field_name=lambda outer, inner: f"{outer}_{inner}",
+                )
+            tree.extend(chunk)
+
+        f["Runs"] = {
+            "run": np.array([385_000], dtype=np.uint32),
+            "genEventCount": np.array([n_events], dtype=np.int64),
+            "genEventSumw": np.array([sum_w], dtype=np.float64),
+        }
+
+    return path
+
+
+def main(
+    path: Path,
+    n_events: int = typer.Option(100_000, help="Number of events."),
+    seed: int = typer.Option(42, help="Random seed."),
+    chunk_size: int = typer.Option(
+        100_000, help="Events per basket (cluster) of every branch."
+    ),
+):
+    write_synthetic_nanoaod(path, n_events, seed, chunk_size)
+    print(f"Wrote {n_events} events to {path}")
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -1,5 +1,8 @@
 from lepton_zoo import Dataset, DatasetType, LHCRun, NanoADODVersion, ProcessGroup, Year
 
+# certified luminosity blocks of the 2024 collisions
+GOLDEN_JSON_2024 = "https://cms-service-dqmdc.web.cern.ch/CAF/certification/Collisions24/Cert_Collisions2024_378981_386951_Golden.json"
+
 datasets: list[Dataset] = []
 
 datasets.append(
@@ -15,6 +18,7 @@ datasets.append(
         xsec=1.0,
         filter_eff=1.0,
         k_factor=1.0,
+        golden_json=GOLDEN_JSON_2024,
     )
 )
 datasets.append(
@@ -30,6 +34,8 @@ datasets.append(
         xsec=1.0,
         filter_eff=1.0,
         k_factor=1.0,
+        golden_json=GOLDEN_JSON_2024,
+        remove_overlap_with=["Muon0"],
     )
 )
 datasets.append(
@@ -1,3 +1,12 @@
-from .classification import run_classification
 from .datasets import Dataset, DatasetType, ProcessGroup
 from .eras import LHCRun, NanoADODVersion, Year
+
+
+def __getattr__(name: str):
+    # run_classification pulls in awkward/uproot/vector, only import it when asked for
+    if name == "run_classification":
+        from .classification import run_classification
+
+        return run_classification
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
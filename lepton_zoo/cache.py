@@ -0,0 +1,349 @@
+import fcntl
+import os
+import re
+import subprocess
+import zlib
+from contextlib import contextmanager
+from functools import cache
+from pathlib import Path
+from typing import Iterator, Sequence
+
+from pydantic import BaseModel
+
+from .io import atomic_path, atomic_write_bytes
+from .redirectors import get_selector
+
+DEFAULT_CACHE_DIR = "nanoaod_files_cache"
+DEFAULT_CACHE_MAX_SIZE = "100GB"
+# bound on one xrdcp copy of a (multi GB) file, the redirector timeout only bounds opening it
+DEFAULT_DOWNLOAD_TIMEOUT = 3600.0
+
+SIZE_UNITS = {
+    "": 1,
+    "B": 1,
+    "KB": 1000,
+    "MB": 1000**2,
+    "GB": 1000**3,
+    "TB": 1000**4,
+    "KIB": 1024,
+    "MIB": 1024**2,
+    "GIB": 1024**3,
+    "TIB": 1024**4,
+}
+
+
+def parse_size(size: str | int) -> int:
+    """
+    "50GB", "1.5TiB", "1000" -> number of bytes.
+    """
+    if isinstance(size, int):
+        return size
+
+    match = re.fullmatch(r"\s*([0-9.]+)\s*([A-Za-z]*)\s*", size)
+    if match is None or match.group(2).upper() not in SIZE_UNITS:
+        raise ValueError(f"Invalid size: {size}")
+
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def adler32(path: Path, block_size: int = 16 * 1024 * 1024) -> str:
+    """
+    Adler-32 checksum as stored by DBS (8 hex digits).
+    """
+    value = 1
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            value = zlib.adler32(block, value)
+
+    return f"{value:08x}"
+
+
+class CacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    downloaded_bytes: int = 0
+    evicted_bytes: int = 0
+    invalid: int = 0
+
+    def add(self, other: "CacheStats") -> None:
+        for field in CacheStats.model_fields:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+
+class NanoAODCache:
+    """
+    Size bounded local cache of NanoAOD files, safe to share between processes.
+
+    - downloads go to a temporary file that is atomically renamed into place, so a partial copy
+      is never seen as a cache hit;
+    - a per-LFN lock makes sure only one process fetches a given file, the others wait for it;
+    - files are validated against the size (and Adler-32, if requested) known from DBS, which is
+      kept next to the cached file so later hits are validated without querying DBS;
+    - the least recently used files are evicted once the cache exceeds max_size (the mtime of a
+      cached file is bumped on every hit);
+    - files pinned by this process (e.g. prefetched, not yet processed) are never evicted by it,
+      and files being fetched by another process (holding their lock) are skipped;
+    - hit/miss/eviction statistics are accumulated in <cache_dir>/stats.json.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = Path(DEFAULT_CACHE_DIR),
+        max_size: int | str = DEFAULT_CACHE_MAX_SIZE,
+        verify_checksum: bool = False,
+        download_timeout: float = DEFAULT_DOWNLOAD_TIMEOUT,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_size = parse_size(max_size)
+        self.verify_checksum = verify_checksum
+        self.download_timeout = download_timeout
+        self.stats = CacheStats()
+        self.pinned: set[Path] = set()
+        # DBS sizes of files known from the catalog, which saves a DBS query per download
+        self.known_sizes: dict[str, int] = {}
+
+        for d in (self.cache_dir, self._locks_dir, self._tmp_dir):
+            d.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def _locks_dir(self) -> Path:
+        return self.cache_dir / ".locks"
+
+    @property
+    def _tmp_dir(self) -> Path:
+        return self.cache_dir / ".tmp"
+
+    @property
+    def _stats_file(self) -> Path:
+        return self.cache_dir / "stats.json"
+
+    def path(self, file_lfn: str) -> Path:
+        return self.cache_dir / file_lfn.replace("/", "_")
+
+    def _metadata_path(self, path: Path) -> Path:
+        return path.with_name(f"{path.name}.meta")
+
+    def add_known_sizes(
+        self, lfns: list[str], file_sizes: Sequence[int | None] | None
+    ) -> None:
+        """
+        Sizes of lfns from the catalog (None or 0 when unknown).
+        """
+        if file_sizes is not None:
+            self.known_sizes.update(
+                (lfn, size) for lfn, size in zip(lfns, file_sizes) if size
+            )
+
+    def is_cached(self, file_lfn: str) -> bool:
+        return self.path(file_lfn).exists()
+
+    @contextmanager
+    def _lock(self, name: str) -> Iterator[None]:
+        with (self._locks_dir / f"{name}.lock").open("a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _try_lock(self, name: str) -> Iterator[bool]:
+        """
+        Like _lock, but yields False instead of waiting if another process holds the lock.
+        """
+        with (self._locks_dir / f"{name}.lock").open("a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def entries(self) -> list[Path]:
+        return [
+            p for p in self.cache_dir.iterdir() if p.is_file() and p.suffix == ".root"
+        ]
+
+    def size(self) -> int:
+        return sum(p.stat().st_size for p in self.entries())
+
+    def _is_valid(
+        self,
+        path: Path,
+        expected_size: int | None,
+        expected_adler32: str | None,
+    ) -> bool:
+        if expected_size is not None and path.stat().st_size != expected_size:
+            return False
+        if (
+            self.verify_checksum
+            and expected_adler32 is not None
+            and adler32(path) != expected_adler32.lower().zfill(8)
+        ):
+            return False
+
+        return True
+
+    def _download(self, file_lfn: str, destination: Path) -> None:
+        """
+        Copy file_lfn from the first redirector (see get_selector) able to open it. Only opening
+        the file goes through the selector, so the copy time is not counted as open latency; the
+        copy is killed after download_timeout seconds.
+        """
+        import uproot
+
+        def probe(redirector: str) -> str:
+            with uproot.open(f"{redirector}{file_lfn}"):
+                return redirector
+
+        redirector = get_selector().run(probe)
+        subprocess.run(
+            ["xrdcp", "--force", f"{redirector}{file_lfn}", str(destination)],
+            check=True,
+            timeout=self.download_timeout,
+        )
+
+    def fetch(
+        self,
+        file_lfn: str,
+        expected_size: int | None = None,
+        expected_adler32: str | None = None,
+    ) -> Path:
+        """
+        Local path of file_lfn, downloading it if needed.
+        """
+        path = self.path(file_lfn)
+        metadata_path = self._metadata_path(path)
+        with self._lock(path.name):
+            if path.exists():
+                if expected_size is None and metadata_path.exists():
+                    expected_size = int(metadata_path.read_text())
+                if self._is_valid(path, expected_size, expected_adler32):
+                    os.utime(path)
+                    self.stats.hits += 1
+                    return path
+                print(f"Cached {file_lfn} is corrupted, fetching it again...")
+                path.unlink()
+                metadata_path.unlink(missing_ok=True)
+                self.stats.invalid += 1
+
+            print(f"Caching {file_lfn}...")
+            self.stats.misses += 1
+            with atomic_path(path, tmp_dir=self._tmp_dir) as tmp_path:
+                self._download(file_lfn, tmp_path)
+                if not self._is_valid(tmp_path, expected_size, expected_adler32):
+                    raise RuntimeError(
+                        f"Downloaded {file_lfn} does not match the DBS file metadata"
+                    )
+                self.stats.downloaded_bytes += tmp_path.stat().st_size
+                atomic_write_bytes(
+                    metadata_path, str(tmp_path.stat().st_size).encode("utf-8")
+                )
+
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Path | None = None) -> None:
+        """
+        Remove least recently used files until the cache fits in max_size.
+        """
+        with self._lock("evict"):
+            pinned = frozenset(self.pinned)
+            entries = sorted(
+                (
+                    (p, p.stat())
+                    for p in self.entries()
+                    if p != keep and p not in pinned
+                ),
+                key=lambda e: e[1].st_mtime,
+            )
+            total = sum(st.st_size for _, st in entries)
+            for p in {keep, *pinned}:
+                if p is not None and p.exists():
+                    total += p.stat().st_size
+
+            for p, st in entries:
+                if total <= self.max_size:
+                    break
+                with self._try_lock(p.name) as locked:
+                    # being validated or fetched again by another process
+                    if not locked:
+                        continue
+                    # files opened by other processes stay readable until they are closed
+                    p.unlink(missing_ok=True)
+                    self._metadata_path(p).unlink(missing_ok=True)
+                total -= st.st_size
+                self.stats.evictions += 1
+                self.stats.evicted_bytes += st.st_size
+
+    def flush_stats(self) -> CacheStats:
+        """
+        Add the statistics of this process to <cache_dir>/stats.json and return the totals.
+        """
+        with self._lock("stats"):
+            totals = CacheStats()
+            if self._stats_file.exists():
+                totals = CacheStats.model_validate_json(self._stats_file.read_text())
+            totals.add(self.stats)
+            atomic_write_bytes(
+                self._stats_file, totals.model_dump_json(indent=2).encode("utf-8")
+            )
+
+        self.stats = CacheStats()
+        return totals
+
+    def read_stats(self) -> CacheStats:
+        totals = CacheStats()
+        if self._stats_file.exists():
+            totals = CacheStats.model_validate_json(self._stats_file.read_text())
+        totals.add(self.stats)
+        return totals
+
+
+@cache
+def get_cache() -> NanoAODCache:
+    """
+    Process wide cache, configured by LEPZOO_CACHE_DIR, LEPZOO_CACHE_MAX_SIZE,
+    LEPZOO_CACHE_VERIFY_CHECKSUM and LEPZOO_DOWNLOAD_TIMEOUT so that it is inherited by workers
+    and sub-commands.
+    """
+    cache = NanoAODCache(
+        Path(os.environ.get("LEPZOO_CACHE_DIR", DEFAULT_CACHE_DIR)),
+        os.environ.get("LEPZOO_CACHE_MAX_SIZE", DEFAULT_CACHE_MAX_SIZE),
+        os.environ.get("LEPZOO_CACHE_VERIFY_CHECKSUM", "0") == "1",
+        float(os.environ.get("LEPZOO_DOWNLOAD_TIMEOUT", DEFAULT_DOWNLOAD_TIMEOUT)),
+    )
+
+    import atexit
+
+    atexit.register(cache.flush_stats)
+    return cache
+
+
+def fetch_nanoaod(file_lfn: str, file_size: int | None = None) -> Path:
+    """
+    Fetch file_lfn into the process wide cache, validated against its size (file_size, or one
+    known from the catalog, see NanoAODCache.add_known_sizes) when it is not cached yet. DBS is
+    only queried for the size when it is not known, or for the Adler-32 when checksums are
+    verified.
+    """
+    cache = get_cache()
+    expected_size = file_size or cache.known_sizes.get(file_lfn)
+    expected_adler32 = None
+    if not cache.is_cached(file_lfn) and (
+        expected_size is None or cache.verify_checksum
+    ):
+        from .datasets import file_metadata
+
+        try:
+            metadata = file_metadata(file_lfn)
+            expected_size = metadata["file_size"]
+            expected_adler32 = metadata["adler32"]
+        except Exception as e:
+            print(f"No DBS metadata for {file_lfn}, skipping validation: {e}")
+
+    return cache.fetch(file_lfn, expected_size, expected_adler32)
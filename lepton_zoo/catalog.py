@@ -0,0 +1,246 @@
+import json
+import mmap
+import struct
+from pathlib import Path
+from typing import Any, Iterator
+
+from .datasets import Dataset
+from .io import atomic_path
+
+# Binary layout:
+#
+#   MAGIC | header size (uint64 LE) | header (JSON) | columns ...
+#
+# The header maps "<process_name>/<year>" to the dataset metadata and the position of its
+# columns in the file. Columns are raw little endian arrays, aligned to 8 bytes. LFNs are stored
+# as an uint64 offsets column (n_lfns + 1 entries) into a blob of concatenated utf-8 strings, so a
+# single LFN can be read without touching the others. When DBS provided them, the file sizes and
+# event counts of the LFNs are stored as uint64 columns (n_lfns entries); for simulation, the
+# generator sums of the LFNs (from their Runs trees) as float64 / int64 columns, an unknown value
+# being NaN / -1.
+MAGIC = b"LZCAT\x00\x01\x00"
+ALIGNMENT = 8
+
+# per LFN columns, named after the Dataset fields they hold, and their struct format
+FILE_COLUMNS = {
+    "file_sizes": "Q",
+    "event_counts": "Q",
+    "gen_event_sumws": "d",
+    "gen_event_counts": "q",
+}
+# loaded with the metadata of a dataset, even without its LFNs
+NORMALIZATION_COLUMNS = ["gen_event_sumws", "gen_event_counts"]
+# stand-in for None in the columns that can hold unknown values
+MISSING = {"d": float("nan"), "q": -1}
+
+
+def catalog_key(process_name: str, year: str) -> str:
+    return f"{process_name}/{year}"
+
+
+def catalog_path(parsed_datasets_file: Path) -> Path:
+    return parsed_datasets_file.with_suffix(".lzcat")
+
+
+class _ColumnWriter:
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+        self.size = 0
+
+    def add(self, data: bytes, fmt: str, count: int) -> dict[str, Any]:
+        padding = -self.size % ALIGNMENT
+        if padding:
+            self.chunks.append(b"\x00" * padding)
+            self.size += padding
+
+        column = {"offset": self.size, "format": fmt, "count": count}
+        self.chunks.append(data)
+        self.size += len(data)
+
+        return column
+
+
+def write_catalog(datasets: list[Dataset], path: Path) -> None:
+    """
+    Write the datasets to an indexed, memory-mappable catalog.
+
+    The file is written to a temporary path and renamed, so concurrent readers never see a
+    partial catalog.
+    """
+    columns = _ColumnWriter()
+    index: dict[str, dict[str, Any]] = {}
+
+    for dataset in datasets:
+        assert dataset.process_name is not None
+        lfns = [lfn.encode("utf-8") for lfn in dataset.lfns or []]
+
+        offsets = [0]
+        for lfn in lfns:
+            offsets.append(offsets[-1] + len(lfn))
+
+        dataset_columns = {
+            "lfn_offsets": columns.add(
+                struct.pack(f"<{len(offsets)}Q", *offsets), "Q", len(offsets)
+            ),
+            "lfn_blob": columns.add(b"".join(lfns), "s", offsets[-1]),
+        }
+        for name, fmt in FILE_COLUMNS.items():
+            values = getattr(dataset, name)
+            if values is not None and len(values) == len(lfns):
+                if fmt in MISSING:
+                    values = [MISSING[fmt] if v is None else v for v in values]
+                dataset_columns[name] = columns.add(
+                    struct.pack(f"<{len(values)}{fmt}", *values), fmt, len(values)
+                )
+
+        index[catalog_key(dataset.process_name, dataset.year)] = {
+            "metadata": dataset.model_dump(
+                mode="json", exclude={"lfns", *FILE_COLUMNS}
+            ),
+            "n_lfns": len(lfns),
+            "columns": dataset_columns,
+        }
+
+    header = json.dumps({"datasets": index}, ensure_ascii=False).encode("utf-8")
+    start = len(MAGIC) + 8 + len(header)
+    start += -start % ALIGNMENT
+    header += b" " * (start - len(MAGIC) - 8 - len(header))
+
+    with atomic_path(path) as tmp_path, tmp_path.open("wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for chunk in columns.chunks:
+            f.write(chunk)
+
+
+class Catalog:
+    """
+    Read-only view of a catalog written by `write_catalog`.
+
+    Opening only parses the header; LFNs are read from the memory-mapped file on demand and no
+    dataset is validated.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a lepton zoo catalog")
+
+        (header_size,) = struct.unpack_from("<Q", self._mm, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        header = json.loads(self._mm[header_start : header_start + header_size])
+        self._data_start = header_start + header_size
+        self._index: dict[str, dict[str, Any]] = header["datasets"]
+
+    def keys(self) -> list[tuple[str, str]]:
+        return [tuple(key.split("/", 1)) for key in self._index]  # type: ignore
+
+    def __contains__(self, key: tuple[str, str]) -> bool:
+        return catalog_key(*key) in self._index
+
+    def _entry(self, process_name: str, year: str) -> dict[str, Any]:
+        try:
+            return self._index[catalog_key(process_name, year)]
+        except KeyError:
+            raise KeyError(f"No dataset for {process_name} {year} in {self.path}")
+
+    def _column_offset(self, entry: dict[str, Any], name: str) -> int:
+        return self._data_start + entry["columns"][name]["offset"]
+
+    def n_lfns(self, process_name: str, year: str) -> int:
+        return self._entry(process_name, year)["n_lfns"]
+
+    def lfn(self, process_name: str, year: str, index: int) -> str:
+        entry = self._entry(process_name, year)
+        if not 0 <= index < entry["n_lfns"]:
+            raise IndexError(
+                f"File index {index} out of range for {process_name} {year} ({entry['n_lfns']} files)"
+            )
+
+        start, stop = struct.unpack_from(
+            "<2Q", self._mm, self._column_offset(entry, "lfn_offsets") + 8 * index
+        )
+        blob = self._column_offset(entry, "lfn_blob")
+        return self._mm[blob + start : blob + stop].decode("utf-8")
+
+    def lfns(self, process_name: str, year: str) -> list[str]:
+        entry = self._entry(process_name, year)
+        n = entry["n_lfns"]
+        offsets = struct.unpack_from(
+            f"<{n + 1}Q", self._mm, self._column_offset(entry, "lfn_offsets")
+        )
+        blob = self._column_offset(entry, "lfn_blob")
+        data = self._mm[blob : blob + offsets[-1]]
+        return [data[offsets[i] : offsets[i + 1]].decode("utf-8") for i in range(n)]
+
+    def file_column(self, process_name: str, year: str, name: str) -> list | None:
+        """
+        One of FILE_COLUMNS for every LFN, None if the catalog does not have it.
+        """
+        entry = self._entry(process_name, year)
+        if name not in entry["columns"]:
+            return None
+
+        fmt = entry["columns"][name]["format"]
+        values = struct.unpack_from(
+            f"<{entry['n_lfns']}{fmt}", self._mm, self._column_offset(entry, name)
+        )
+        match fmt:
+            case "d":
+                return [None if v != v else v for v in values]
+            case "q":
+                return [None if v == MISSING["q"] else v for v in values]
+            case _:
+                return list(values)
+
+    def dataset(self, process_name: str, year: str, with_lfns: bool = False) -> Dataset:
+        """
+        Dataset metadata, without re-running the validators (it was validated by `lepzoo build`).
+        LFNs (and their sizes and event counts) are only loaded if `with_lfns` is set; the
+        generator sums, needed for the normalization, always are.
+        """
+        entry = self._entry(process_name, year)
+        if not with_lfns:
+            return Dataset.model_construct(
+                **entry["metadata"],
+                lfns=None,
+                **{
+                    name: self.file_column(process_name, year, name)
+                    for name in NORMALIZATION_COLUMNS
+                },
+            )
+
+        return Dataset.model_construct(
+            **entry["metadata"],
+            lfns=self.lfns(process_name, year),
+            **{
+                name: self.file_column(process_name, year, name)
+                for name in FILE_COLUMNS
+            },
+        )
+
+    def datasets(self, with_lfns: bool = False) -> Iterator[Dataset]:
+        for process_name, year in self.keys():
+            yield self.dataset(process_name, year, with_lfns)
+
+
+def open_catalog(parsed_datasets_file: Path) -> Catalog:
+    """
+    Open the catalog next to parsed_datasets_file, converting the JSON file if the catalog is
+    missing or older than it.
+    """
+    path = catalog_path(parsed_datasets_file)
+    if not path.exists() or (
+        parsed_datasets_file.exists()
+        and path.stat().st_mtime < parsed_datasets_file.stat().st_mtime
+    ):
+        print(f"Building {path} from {parsed_datasets_file} ...")
+        with parsed_datasets_file.open("r", encoding="utf-8") as f:
+            parsed_datasets = json.load(f)
+        write_catalog([Dataset.model_validate(obj) for obj in parsed_datasets], path)
+
+    return Catalog(path)
@@ -1,25 +1,141 @@
-from .datasets import Dataset
-from .events import Events
+from pathlib import Path
+
+from .datasets import Dataset, DatasetType
+from .duplicates import index_path
+from .event_classes import EventClasses
+from .events import DEFAULT_STEP_SIZE, Events
+from .preselection import Preselection
+from .profiling import stage
 
 
 def run_classification(
-    file_to_process: str | int, dataset: Dataset, silence_mode: bool, enable_cache: bool
-) -> None:
+    file_to_process: str | int | list[str],
+    dataset: Dataset,
+    silence_mode: bool,
+    enable_cache: bool,
+    step_size: int = DEFAULT_STEP_SIZE,
+    enable_skim_cache: bool = False,
+    output_file: Path | None = None,
+    entry_start: int | None = None,
+    entry_stop: int | None = None,
+    preselection: Preselection | None = None,
+    prefetch_depth: int = 2,
+) -> EventClasses:
     """
-    Will classify one file
+    Will classify one file (or its [entry_start, entry_stop) range), or a batch of files, streaming
+    them in chunks of step_size entries, and return the event counts per event class. Simulated
+    events are weighted by genWeight * xsec * filter_eff * k_factor / (sum of the genWeight of the
+    dataset), so sumw is the yield per pb^-1; data events have unit weights. With output_file the
+    result is also written there, to be combined by `lepzoo merge`. With a preselection, or a
+    golden JSON and overlapping datasets for data, only the passing events are read and
+    classified.
     """
 
     match file_to_process:
         case str():
-            pass
+            files = [file_to_process]
         case int():
             assert dataset.lfns is not None
-            file_to_process = dataset.lfns[file_to_process]
+            files = [dataset.lfns[file_to_process]]
+        case list():
+            files = file_to_process
+            if len(files) > 1 and (entry_start is not None or entry_stop is not None):
+                raise ValueError("An entry range can only be given for a single file")
         case _:
-            ValueError("Invalid type for file_to_process")
+            raise ValueError("Invalid type for file_to_process")
+
+    # a batch of files is downloaded ahead while the previous one is processed
+    file_iterator = files
+    if enable_cache and len(files) > 1 and prefetch_depth > 0:
+        from .prefetch import Prefetcher
+
+        file_iterator = Prefetcher(files, depth=prefetch_depth)
+
+    # events of this dataset already in the earlier datasets it overlaps with
+    duplicate_indexes = [
+        str(index_path(process_name, dataset.year))
+        for process_name in dataset.remove_overlap_with or []
+    ]
+
+    is_simulation = dataset.dataset_type != DatasetType.DATA
+    weight = dataset.xsec * dataset.filter_eff * dataset.k_factor
+    gen_event_sumw = dataset.gen_event_sumw if is_simulation else None
+    if gen_event_sumw:
+        weight /= gen_event_sumw
+    elif is_simulation:
+        print(
+            f"No generator sums for {dataset.process_name} (build the catalog with --gen-sums), its yields will not be normalized"
+        )
+    event_classes = EventClasses()
+    n_entries = n_passing = bytes_read = bytes_skipped = 0
+    preselect_time = read_time = time_saved = 0.0
+    for file_lfn in file_iterator:
+        with stage(
+            "run_classification",
+            file=file_lfn,
+            entry_start=entry_start,
+            entry_stop=entry_stop,
+        ):
+            for events in Events.iterate_events(
+                file_lfn,
+                enable_cache,
+                step_size,
+                entry_start=entry_start,
+                entry_stop=entry_stop,
+                enable_skim_cache=enable_skim_cache,
+                nanoaod_version=dataset.nanoadod_version,
+                preselection=preselection,
+                golden_json=dataset.golden_json,
+                duplicate_indexes=duplicate_indexes,
+                with_gen_weight=is_simulation,
+            ):
+                events.materialize()
+                if not silence_mode:
+                    print(events.read_report())
+                n_entries += events.n_entries or 0
+                n_passing += events.n_passing or 0
+                bytes_read += events.bytes_read
+                bytes_skipped += events.bytes_skipped
+                preselect_time += events.preselect_time
+                read_time += events.read_time
+                time_saved += events.time_saved
+
+                with stage("classify", file=file_lfn):
+                    event_classes.fill(
+                        events, weight * events.gen_weight if is_simulation else weight
+                    )
 
-    events = Events.build_events(file_to_process, enable_cache)
     if not silence_mode:
-        print(events)
+        print(event_classes.report())
+        if (
+            preselection is not None
+            or dataset.golden_json is not None
+            or duplicate_indexes
+        ):
+            print(
+                f"Preselection: {n_passing}/{n_entries} events passed, {bytes_read / 1e6:.1f} MB read, {bytes_skipped / 1e6:.1f} MB of baskets skipped; preselection pass {preselect_time:.2f} s, read {read_time:.2f} s, up to {time_saved:.2f} s saved"
+            )
+
+    if output_file is not None:
+        from .results import ResultMetadata, write_result
+
+        assert dataset.process_name is not None
+        write_result(
+            event_classes,
+            ResultMetadata(
+                process_name=dataset.process_name,
+                year=dataset.year,
+                xsec=dataset.xsec,
+                filter_eff=dataset.filter_eff,
+                k_factor=dataset.k_factor,
+                n_events=int(event_classes.counts.sum()),
+                files=files,
+                coverage=[(lfn, entry_start or 0, entry_stop) for lfn in files],
+                preselection=preselection,
+                gen_event_sumw=gen_event_sumw,
+                normalized=not is_simulation or bool(gen_event_sumw),
+            ),
+            output_file,
+        )
 
-    return
+    return event_classes
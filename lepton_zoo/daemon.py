@@ -0,0 +1,278 @@
+import json
+import os
+import shutil
+import socket
+import socketserver
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Iterator
+
+from .executor import JobResult, WorkItem, _init_worker, _run_work_item
+
+DEFAULT_DAEMON_SOCKET = ".lepzoo_daemon.sock"
+DEFAULT_OPEN_TREES = 8
+
+
+def daemon_socket() -> Path:
+    return Path(os.environ.get("LEPZOO_DAEMON_SOCKET", DEFAULT_DAEMON_SOCKET))
+
+
+def environment() -> dict[str, Any]:
+    """
+    What jobs depend on besides their WorkItem: the working directory (relative cache, skim and
+    result paths) and the LEPZOO_* settings (redirectors, profiling, cache, ...).
+    """
+    return {
+        "cwd": os.getcwd(),
+        "env": {
+            k: v
+            for k, v in os.environ.items()
+            if k.startswith("LEPZOO_") and k != "LEPZOO_DAEMON_SOCKET"
+        },
+    }
+
+
+def environment_mismatch(daemon: dict[str, Any], client: dict[str, Any]) -> str | None:
+    """
+    Why a client with this environment can not be served by the daemon, None if it can.
+    """
+    if daemon["cwd"] != client["cwd"]:
+        return f"the daemon runs in {daemon['cwd']}, not in {client['cwd']}"
+
+    daemon_env, client_env = dict(daemon["env"]), dict(client["env"])
+    # the daemon keeps trees open by default, the client may leave it unset
+    if "LEPZOO_OPEN_TREES" not in client_env:
+        daemon_env.pop("LEPZOO_OPEN_TREES", None)
+    differing = sorted(
+        k
+        for k in daemon_env.keys() | client_env.keys()
+        if daemon_env.get(k) != client_env.get(k)
+    )
+    if differing:
+        return f"{', '.join(differing)} differ between the daemon and this shell"
+
+    return None
+
+
+def _init_daemon_worker(catalog_file: Path) -> None:
+    _init_worker(catalog_file)
+    # pay the awkward/uproot/vector import once per worker, not on the first job
+    from . import classification  # noqa: F401
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "LepzooDaemon"
+
+    def send(self, message: dict[str, Any]) -> None:
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def handle(self) -> None:
+        request = json.loads(self.rfile.readline())
+        match request["command"]:
+            case "ping":
+                self.send({"type": "pong", "pid": os.getpid()})
+            case "shutdown":
+                self.send({"type": "bye"})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            case "run":
+                mismatch = environment_mismatch(
+                    self.server.environment, request["environment"]
+                )
+                if mismatch is not None:
+                    self.send({"type": "refused", "message": mismatch})
+                    return
+                self.server.run_job(
+                    Path(request["catalog"]),
+                    [WorkItem.model_validate(item) for item in request["items"]],
+                    self.send,
+                )
+            case command:
+                self.send({"type": "error", "message": f"Unknown command {command}"})
+
+
+class LepzooDaemon(socketserver.ThreadingUnixStreamServer):
+    """
+    Serves classification jobs on a local Unix socket with a pool of warm worker processes.
+
+    The workers keep their imports, the catalog (reloaded when it changes on disk) and the
+    recently opened NanoAOD trees and skims (see LEPZOO_OPEN_TREES) between jobs.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, n_workers: int | None = None) -> None:
+        self.socket_path = socket_path
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.outputs_dir = Path("daemon_outputs")
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_catalog: tuple[Path, float] | None = None
+        self._lock = threading.Lock()
+        self._next_seq = 0
+        # jobs are only accepted from clients with the same environment
+        self.environment = environment()
+
+        if socket_path.exists():
+            if is_running(socket_path):
+                raise RuntimeError(f"A daemon is already listening on {socket_path}")
+            socket_path.unlink()
+        super().__init__(str(socket_path), _Handler)
+
+    def _get_pool(self, catalog_file: Path) -> ProcessPoolExecutor:
+        key = (catalog_file.resolve(), catalog_file.stat().st_mtime)
+        with self._lock:
+            if self._pool is None or self._pool_catalog != key:
+                if self._pool is not None:
+                    print(f"{catalog_file} changed, restarting the workers...")
+                    self._pool.shutdown(wait=False)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.n_workers,
+                    initializer=_init_daemon_worker,
+                    initargs=(key[0],),
+                )
+                self._pool_catalog = key
+            return self._pool
+
+    def warm_up(self, catalog_file: Path) -> None:
+        """
+        Start the workers for catalog_file now rather than on the first job.
+        """
+        pool = self._get_pool(catalog_file)
+        wait([pool.submit(os.getpid) for _ in range(self.n_workers)])
+
+    def run_job(self, catalog_file: Path, items: list[WorkItem], send) -> None:
+        """
+        Run the items on the warm workers, sending one message per finished item and a summary.
+        """
+        pool = self._get_pool(catalog_file)
+        with self._lock:
+            # seq only names the output directory of an item
+            for item in items:
+                self._next_seq += 1
+                item.seq = self._next_seq
+
+        running = {
+            pool.submit(_run_work_item, item, self.outputs_dir): item for item in items
+        }
+        failed = 0
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if isinstance(e, BrokenProcessPool):
+                        # a worker died (e.g. OOM kill), start a new pool for the next job
+                        with self._lock:
+                            if self._pool is pool:
+                                self._pool = None
+                    result = JobResult(
+                        seq=item.seq,
+                        start_time=0.0,
+                        run_time=0.0,
+                        exit_value=255,
+                        received_bytes=0,
+                    )
+                failed += result.exit_value != 0
+
+                output_dir = self.outputs_dir / str(item.seq)
+                send(
+                    {
+                        "type": "item",
+                        "item": item.model_dump(mode="json"),
+                        "exit_value": result.exit_value,
+                        "run_time": result.run_time,
+                        "stdout": _read_output(output_dir / "stdout"),
+                        "stderr": _read_output(output_dir / "stderr"),
+                    }
+                )
+                # sent to the client, nothing else reads it
+                shutil.rmtree(output_dir, ignore_errors=True)
+
+        send({"type": "done", "n_items": len(items), "failed": failed})
+
+    def server_close(self) -> None:
+        super().server_close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        self.socket_path.unlink(missing_ok=True)
+
+
+def _read_output(path: Path) -> str:
+    return path.read_text(encoding="utf-8") if path.exists() else ""
+
+
+def serve(
+    socket_path: Path, n_workers: int | None = None, catalog_file: Path | None = None
+) -> None:
+    # trees stay open in the workers between jobs, unless configured otherwise
+    os.environ.setdefault("LEPZOO_OPEN_TREES", str(DEFAULT_OPEN_TREES))
+    with LepzooDaemon(socket_path, n_workers) as server:
+        if catalog_file is not None:
+            server.warm_up(catalog_file)
+        print(f"lepzoo daemon listening on {socket_path} ({server.n_workers} workers)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def _request(socket_path: Path, request: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    # connect right away, so a missing daemon raises here and not on the first message
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(socket_path))
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+    except OSError:
+        sock.close()
+        raise
+
+    return _messages(sock)
+
+
+def _messages(sock: socket.socket) -> Iterator[dict[str, Any]]:
+    with sock, sock.makefile("rb") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def is_running(socket_path: Path | None = None) -> bool:
+    socket_path = socket_path or daemon_socket()
+    if not socket_path.exists():
+        return False
+    try:
+        return any(
+            m["type"] == "pong" for m in _request(socket_path, {"command": "ping"})
+        )
+    except OSError:
+        return False
+
+
+def stop(socket_path: Path | None = None) -> bool:
+    socket_path = socket_path or daemon_socket()
+    if not is_running(socket_path):
+        return False
+    for _ in _request(socket_path, {"command": "shutdown"}):
+        pass
+    return True
+
+
+def submit(
+    catalog_file: Path, items: list[WorkItem], socket_path: Path | None = None
+) -> Iterator[dict[str, Any]]:
+    """
+    Run items on the daemon, yielding its messages as the items finish. Raises OSError if no
+    daemon is listening.
+    """
+    return _request(
+        socket_path or daemon_socket(),
+        {
+            "command": "run",
+            "catalog": str(catalog_file.resolve()),
+            "environment": environment(),
+            "items": [item.model_dump(mode="json") for item in items],
+        },
+    )
@@ -1,21 +1,18 @@
 import getpass
+import math
 import os
-from concurrent.futures import ProcessPoolExecutor, as_completed
 from enum import StrEnum
-from typing import Self
+from functools import cache
+from typing import TYPE_CHECKING, Self
 
-import uproot
-from dbs.apis.dbsClient import DbsApi
-from numpy import result_type
 from pydantic import BaseModel, model_validator
-from rich.progress import track
-
-from lepton_zoo import redirectors
 
 from .eras import LHCRun, NanoADODVersion, Year
-from .redirectors import Redirectors
 
-dbs = DbsApi("https://cmsweb.cern.ch/dbs/prod/global/DBSReader")
+if TYPE_CHECKING:
+    from dbs.apis.dbsClient import DbsApi
+
+DBS_URL = "https://cmsweb.cern.ch/dbs/prod/global/DBSReader"
 
 try:
     os.environ["USER"]
@@ -24,17 +21,25 @@ except KeyError as _:
     os.environ["USER"] = getpass.getuser()
 
 
-def test_file(f):
-    success = False
-    for redirector in Redirectors:
-        try:
-            uproot.open(f"{redirector}{f}")
-            success = True
-            break
-        except:
-            continue
+@cache
+def get_dbs() -> "DbsApi":
+    """
+    DBS client, created on first use (importing and authenticating it is slow).
+    """
+    from dbs.apis.dbsClient import DbsApi
+
+    return DbsApi(DBS_URL)
+
 
-    return success, f
+def file_metadata(file_lfn: str) -> dict:
+    """
+    DBS metadata of one file (file_size, adler32, event_count, ...).
+    """
+    files = get_dbs().listFiles(logical_file_name=file_lfn, detail=True)
+    if not files:
+        raise RuntimeError(f"{file_lfn} not found in DBS")
+
+    return files[0]
 
 
 class ProcessGroup(StrEnum):
@@ -67,11 +72,32 @@ class Dataset(BaseModel):
     filter_eff: float
     k_factor: float
     lfns: list[str] | None = None
+    # DBS size [bytes] and number of events of each of lfns, when known
+    file_sizes: list[int] | None = None
+    event_counts: list[int] | None = None
+    # sum of the generator weights and number of generated events of each of lfns (simulation
+    # only, from the Runs trees), None for a file whose Runs tree could not be read
+    gen_event_sumws: list[float | None] | None = None
+    gen_event_counts: list[int | None] | None = None
     generator_filter: str | None = None
+    # certified luminosity blocks (path or URL), only events in them are classified
+    golden_json: str | None = None
+    # process names of the same year whose events (see `lepzoo dedup-index`) are removed from
+    # this dataset, e.g. Muon0 for Muon1
+    remove_overlap_with: list[str] | None = None
 
     def short_str(self) -> str:
         return f"[{self.process_name}]_[{self.process_group}]_[{self.year}]_[{self.lhc_run}]_[{self.dataset_type}]"
 
+    @property
+    def gen_event_sumw(self) -> float | None:
+        """
+        Sum of the generator weights of the whole dataset, None if it is unknown for any file.
+        """
+        if not self.gen_event_sumws or any(s is None for s in self.gen_event_sumws):
+            return None
+        return math.fsum(self.gen_event_sumws)  # type: ignore[arg-type]
+
     @model_validator(mode="after")
     def set_xsec(self) -> Self:
         if self.dataset_type == DatasetType.DATA:
@@ -101,28 +127,57 @@ class Dataset(BaseModel):
     @model_validator(mode="after")
     def build_lfn_list(self) -> Self:
         if self.lfns is None:
+            from .listings import get_build_cache
+            from .probing import NotEnoughFilesError, ProbeCache, probe_files
+
+            build_cache = get_build_cache()
+            probe_cache = None
             self.lfns = []
+            listed: dict[str, dict] = {}
             for das_name in self.das_names:
+                files = build_cache.listing(das_name)
+                listed.update({file["logical_file_name"]: file for file in files})
+                cached_lfns = build_cache.lfns(das_name, files)
+                if cached_lfns is not None:
+                    print(f"Listing of {das_name} unchanged, reusing tested files...")
+                    self.lfns += cached_lfns
+                    continue
+
                 print(f"Testing files for {das_name}...")
-                all_files = [
-                    file["logical_file_name"].strip()
-                    for file in dbs.listFiles(dataset=das_name)
-                ]
-                results = []
-                with ProcessPoolExecutor() as ex:
-                    futures = [ex.submit(test_file, f) for f in all_files]
-                    for fut in track(
-                        as_completed(futures),
-                        total=len(futures),
-                        description=f"Processing...",
-                    ):
-                        success, f = fut.result()
-                        if success:
-                            results.append(f)
-
-                if len(results) / len(all_files) < 0.6:
-                    raise RuntimeError(f"Not enough files passed test for {das_name}")
+                all_files = [file["logical_file_name"] for file in files]
+                if probe_cache is None:
+                    probe_cache = ProbeCache()
+                try:
+                    results = probe_files(
+                        all_files, min_fraction=0.6, cache=probe_cache
+                    )
+                except NotEnoughFilesError as e:
+                    raise RuntimeError(
+                        f"Not enough files passed test for {das_name}: {e}"
+                    )
+                build_cache.store_lfns(das_name, files, results)
 
                 self.lfns += results
 
+            self.file_sizes = [listed[lfn]["file_size"] or 0 for lfn in self.lfns]
+            self.event_counts = [listed[lfn]["event_count"] or 0 for lfn in self.lfns]
+
+        return self
+
+    @model_validator(mode="after")
+    def set_gen_sums(self) -> Self:
+        # only during `lepzoo build`, which sets LEPZOO_GEN_SUMS
+        if (
+            self.gen_event_sumws is None
+            and self.lfns
+            and self.dataset_type != DatasetType.DATA
+            and os.environ.get("LEPZOO_GEN_SUMS", "0") == "1"
+        ):
+            from .normalization import gen_sums
+
+            self.gen_event_sumws, self.gen_event_counts = gen_sums(
+                self.lfns,
+                description=f"Reading generator sums of {self.process_name}...",
+            )
+
         return self
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import cache
+from pathlib import Path
+
+import numpy as np
+
+from .io import atomic_path, atomic_write_json
+from .lumi_mask import lumi_keys
+
+DEFAULT_DEDUP_DIR = "dedup_index"
+
+EVENT_ID_BRANCHES = ["run", "luminosityBlock", "event"]
+
+# the keys of an index are split by (run, luminosity block) into 2**PARTITION_BITS partitions
+PARTITION_BITS = 8
+N_PARTITIONS = 1 << PARTITION_BITS
+
+_U64 = np.uint64
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer: a bijection of uint64 spreading every input bit over the output
+    x = x ^ (x >> _U64(30))
+    x = x * _U64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> _U64(27))
+    x = x * _U64(0x94D049BB133111EB)
+    return x ^ (x >> _U64(31))
+
+
+def event_keys(
+    runs: np.ndarray, lumis: np.ndarray, events: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    64 bit hashed keys of (run, luminosityBlock, event) and their partition, which only depends
+    on (run, luminosityBlock). Two different events share a key with a probability of 2**-64.
+    """
+    lumi_hash = _mix(lumi_keys(runs, lumis))
+    keys = _mix(lumi_hash ^ np.asarray(events, dtype=np.uint64))
+    partitions = (lumi_hash >> _U64(64 - PARTITION_BITS)).astype(np.intp)
+    return keys, partitions
+
+
+def index_path(process_name: str, year: str, dedup_dir: Path | None = None) -> Path:
+    if dedup_dir is None:
+        dedup_dir = Path(os.environ.get("LEPZOO_DEDUP_DIR", DEFAULT_DEDUP_DIR))
+    return dedup_dir / f"{process_name}_{year}"
+
+
+def _write_npy(path: Path, array: np.ndarray) -> None:
+    with atomic_path(path, ".npy") as tmp_path:
+        np.save(tmp_path, array)
+
+
+def _index_file(file_lfn: str, enable_cache: bool, output: Path) -> np.ndarray:
+    """
+    Write the keys of file_lfn, sorted by partition then key, to output and return the offsets of
+    the partitions in it.
+    """
+    from .events import DEFAULT_STEP_SIZE, load_file
+
+    tree = load_file(file_lfn, enable_cache)
+    keys, partitions = [], []
+    for arrays in tree.iterate(
+        EVENT_ID_BRANCHES, step_size=DEFAULT_STEP_SIZE, library="np"
+    ):
+        k, p = event_keys(arrays["run"], arrays["luminosityBlock"], arrays["event"])
+        keys.append(k)
+        partitions.append(p)
+
+    all_keys = np.concatenate(keys) if keys else np.zeros(0, dtype=np.uint64)
+    all_partitions = np.concatenate(partitions) if partitions else np.zeros(0, np.intp)
+    order = np.lexsort((all_keys, all_partitions))
+    _write_npy(output, all_keys[order])
+
+    return np.searchsorted(all_partitions[order], np.arange(N_PARTITIONS + 1))
+
+
+def _merge_partition(
+    files_dir: Path, starts: np.ndarray, stops: np.ndarray, output: Path
+) -> tuple[int, str]:
+    # starts/stops: position of the partition in the keys of every file
+    chunks = [
+        np.load(files_dir / f"{i}.npy", mmap_mode="r")[start:stop]
+        for i, (start, stop) in enumerate(zip(starts.tolist(), stops.tolist()))
+    ]
+    keys = np.unique(np.concatenate(chunks)) if chunks else np.zeros(0, np.uint64)
+    _write_npy(output, keys)
+    return len(keys), hashlib.sha256(keys.tobytes()).hexdigest()
+
+
+def build_index(
+    path: Path,
+    lfns: list[str],
+    n_workers: int | None = None,
+    enable_cache: bool = False,
+) -> dict[str, int]:
+    """
+    Index the events of lfns into path, reading only their run/luminosityBlock/event branches.
+
+    Files are hashed in parallel, then every partition is merged (sorted, unique keys) in
+    parallel, so a worker only holds about 1/N_PARTITIONS of the keys. index.json is written last:
+    an index without it is incomplete. Its digest identifies the keys, so that results deduplicated
+    against an index are redone when it is rebuilt with other events (see manifest.config_hash).
+    """
+    tmp_dir = path / ".files"
+    shutil.rmtree(path, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers) as ex:
+            file_keys = [tmp_dir / f"{i}.npy" for i in range(len(lfns))]
+            futures = {
+                ex.submit(_index_file, lfn, enable_cache, output): i
+                for i, (lfn, output) in enumerate(zip(lfns, file_keys))
+            }
+            offsets = np.zeros((len(lfns), N_PARTITIONS + 1), dtype=np.int64)
+            for future in as_completed(futures):
+                offsets[futures[future]] = future.result()
+
+            partitions = list(
+                ex.map(
+                    _merge_partition,
+                    [tmp_dir] * N_PARTITIONS,
+                    [offsets[:, p] for p in range(N_PARTITIONS)],
+                    [offsets[:, p + 1] for p in range(N_PARTITIONS)],
+                    [path / f"part_{p:03d}.npy" for p in range(N_PARTITIONS)],
+                )
+            )
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    summary = {
+        "n_files": len(lfns),
+        "n_events": int(offsets[:, -1].sum()),
+        "n_keys": sum(n for n, _ in partitions),
+        "digest": hashlib.sha256(
+            "".join(digest for _, digest in partitions).encode("utf-8")
+        ).hexdigest()[:16],
+    }
+    # read by config_hash, possibly while another index is built
+    atomic_write_json(path / "index.json", summary)
+    return summary
+
+
+class DuplicateIndex:
+    """
+    Read-only view of an index written by `build_index`. Partitions are memory-mapped on first
+    use, so checking a file only touches the partitions of its luminosity blocks.
+    """
+
+    def __init__(self, path: Path) -> None:
+        if not (path / "index.json").exists():
+            raise FileNotFoundError(
+                f"No complete duplicate index in {path}, build it with `lepzoo dedup-index`"
+            )
+        self.path = path
+        self._partitions: dict[int, np.ndarray] = {}
+
+    def partition(self, p: int) -> np.ndarray:
+        if p not in self._partitions:
+            self._partitions[p] = np.load(
+                self.path / f"part_{p:03d}.npy", mmap_mode="r"
+            )
+        return self._partitions[p]
+
+    def contains(self, keys: np.ndarray, partitions: np.ndarray) -> np.ndarray:
+        """
+        Whether each key (see event_keys) is in the index.
+        """
+        found = np.zeros(len(keys), dtype=bool)
+        order = np.argsort(partitions, kind="stable")
+        sorted_partitions = partitions[order]
+        for p in np.unique(sorted_partitions).tolist():
+            index_keys = self.partition(p)
+            if len(index_keys) == 0:
+                continue
+            selected = order[
+                np.searchsorted(sorted_partitions, p) : np.searchsorted(
+                    sorted_partitions, p, side="right"
+                )
+            ]
+            i = np.minimum(
+                np.searchsorted(index_keys, keys[selected]), len(index_keys) - 1
+            )
+            found[selected] = index_keys[i] == keys[selected]
+        return found
+
+
+@cache
+def _open_index(path: Path, mtime: float) -> DuplicateIndex:
+    return DuplicateIndex(path)
+
+
+def index_summary(path: Path) -> dict | None:
+    """
+    index.json of the index at path, None if it is missing or incomplete.
+    """
+    summary = path / "index.json"
+    if not summary.exists():
+        return None
+    return json.loads(summary.read_text(encoding="utf-8"))
+
+
+def open_index(path: Path) -> DuplicateIndex:
+    """
+    Index at path, opened once per process (and again if it was rebuilt).
+    """
+    summary = path / "index.json"
+    return _open_index(path, summary.stat().st_mtime if summary.exists() else 0.0)
+
+
+def duplicate_mask(
+    index_paths: list[str], runs: np.ndarray, lumis: np.ndarray, events: np.ndarray
+) -> np.ndarray:
+    """
+    Events already in any of the indexes.
+    """
+    keys, partitions = event_keys(runs, lumis, events)
+    duplicates = np.zeros(len(keys), dtype=bool)
+    for path in index_paths:
+        duplicates |= open_index(Path(path)).contains(keys, partitions)
+    return duplicates
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+from typing import Self
+
+import awkward as ak
+import numpy as np
+
+from .events import Events
+
+# object -> (name in the class name, min pT [GeV], max |eta|), in class name order
+OBJECTS: dict[str, tuple[str, float, float]] = {
+    "muons": ("Muon", 25.0, 2.4),
+    "electrons": ("Electron", 25.0, 2.5),
+    "jets": ("Jet", 50.0, 2.4),
+    "met": ("MET", 100.0, np.inf),
+}
+
+# multiplicities are packed in MULTIPLICITY_BITS bits per object and saturate at MAX_MULTIPLICITY:
+# that bin holds MAX_MULTIPLICITY or more objects, and is named e.g. "15+Jet"
+MULTIPLICITY_BITS = 4
+MAX_MULTIPLICITY = (1 << MULTIPLICITY_BITS) - 1
+N_CLASS_IDS = 1 << (MULTIPLICITY_BITS * len(OBJECTS))
+CLASSES_SHAPE = (MAX_MULTIPLICITY + 1,) * len(OBJECTS)
+
+# kinematic variable -> (bin width [GeV], number of bins), the last bin holds the overflow
+VARIABLES: dict[str, tuple[float, int]] = {
+    "sum_pt": (10.0, 1000),
+    "inv_mass": (10.0, 1000),
+    "met": (10.0, 500),
+}
+
+
+def passing_objects(events: Events) -> dict[str, ak.Array]:
+    """
+    Mask of the objects passing the pT/eta thresholds (a flat mask for the one MET per event).
+    """
+    masks = {}
+    for name, (_, min_pt, max_eta) in OBJECTS.items():
+        collection = events.collection(name)
+        passing = collection.pt > min_pt
+        if np.isfinite(max_eta):
+            passing = passing & (abs(collection.eta) < max_eta)
+        masks[name] = passing
+
+    return masks
+
+
+def object_counts(masks: dict[str, ak.Array]) -> dict[str, np.ndarray]:
+    """
+    Number of objects passing the pT/eta thresholds, per event.
+    """
+    return {
+        name: (
+            ak.to_numpy(ak.sum(passing, axis=-1))
+            if passing.ndim > 1
+            else ak.to_numpy(passing).astype(np.int64)
+        )
+        for name, passing in masks.items()
+    }
+
+
+def kinematics(events: Events, masks: dict[str, ak.Array]) -> dict[str, np.ndarray]:
+    """
+    Per event sum of the pT of the selected objects (MET included), invariant mass of the selected
+    visible objects and MET.
+    """
+    n_events = len(masks["met"])
+    sum_pt = np.zeros(n_events)
+    px, py, pz, energy = (np.zeros(n_events) for _ in range(4))
+    for name in ("muons", "electrons", "jets"):
+        selected = events.collection(name)[masks[name]]
+        sum_pt += ak.to_numpy(ak.sum(selected.pt, axis=-1))
+        px += ak.to_numpy(ak.sum(selected.px, axis=-1))
+        py += ak.to_numpy(ak.sum(selected.py, axis=-1))
+        pz += ak.to_numpy(ak.sum(selected.pz, axis=-1))
+        energy += ak.to_numpy(ak.sum(selected.E, axis=-1))
+
+    met = ak.to_numpy(events.met.pt).astype(np.float64)
+    sum_pt += np.where(ak.to_numpy(masks["met"]), met, 0.0)
+
+    return {
+        "sum_pt": sum_pt,
+        "inv_mass": np.sqrt(np.maximum(energy**2 - px**2 - py**2 - pz**2, 0.0)),
+        "met": met,
+    }
+
+
+def pack_class_ids(counts: dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Event class of every event as one integer: the saturated multiplicity of the i-th object of
+    OBJECTS sits in bits [i * MULTIPLICITY_BITS, (i + 1) * MULTIPLICITY_BITS).
+    """
+    class_ids = np.zeros(len(next(iter(counts.values()))), dtype=np.int64)
+    for i, name in enumerate(OBJECTS):
+        class_ids |= np.minimum(counts[name], MAX_MULTIPLICITY).astype(np.int64) << (
+            i * MULTIPLICITY_BITS
+        )
+
+    return class_ids
+
+
+def unpack_class_id(class_id: int) -> dict[str, int]:
+    return {
+        name: (class_id >> (i * MULTIPLICITY_BITS)) & MAX_MULTIPLICITY
+        for i, name in enumerate(OBJECTS)
+    }
+
+
+def class_name(class_id: int, suffix: str = "") -> str:
+    """
+    E.g. "2Muon_1Electron_3Jet_1MET", objects with no multiplicity are left out and a saturated
+    multiplicity reads "15+Jet".
+    """
+    multiplicities = unpack_class_id(class_id)
+    name = "_".join(
+        f"{multiplicities[obj]}{'+' if multiplicities[obj] == MAX_MULTIPLICITY else ''}{label}"
+        for obj, (label, _, _) in OBJECTS.items()
+        if multiplicities[obj] > 0
+    )
+    return f"{name or 'Empty'}{suffix}"
+
+
+class SparseHistogram:
+    """
+    Histograms of one variable for every event class, stored as the non-empty bins only:
+    key = class_id * n_bins + bin, sorted.
+    """
+
+    def __init__(
+        self,
+        keys: np.ndarray | None = None,
+        sumw: np.ndarray | None = None,
+        sumw2: np.ndarray | None = None,
+    ) -> None:
+        self.keys = np.zeros(0, dtype=np.int64) if keys is None else keys
+        self.sumw = np.zeros(0) if sumw is None else sumw
+        self.sumw2 = np.zeros(0) if sumw2 is None else sumw2
+
+    def add(self, keys: np.ndarray, sumw: np.ndarray, sumw2: np.ndarray) -> None:
+        self.keys, inverse = np.unique(
+            np.concatenate([self.keys, keys]), return_inverse=True
+        )
+        self.sumw = np.bincount(inverse, weights=np.concatenate([self.sumw, sumw]))
+        self.sumw2 = np.bincount(inverse, weights=np.concatenate([self.sumw2, sumw2]))
+
+    def __iadd__(self, other: SparseHistogram) -> Self:
+        self.add(other.keys, other.sumw, other.sumw2)
+        return self
+
+
+class EventClasses:
+    """
+    Event counts and weighted yields per event class, as dense histograms over the packed class
+    IDs, plus sparse histograms of the kinematic VARIABLES per class.
+
+    Exclusive classes are filled with a single bincount per chunk. Inclusive ("+X": at least these
+    objects) and jet-inclusive ("+NJet": these leptons and MET, at least these jets) counts are
+    cumulative sums of the exclusive histogram, so they cost nothing per event.
+    """
+
+    def __init__(self) -> None:
+        self.counts = np.zeros(N_CLASS_IDS, dtype=np.int64)
+        self.sumw = np.zeros(N_CLASS_IDS)
+        self.sumw2 = np.zeros(N_CLASS_IDS)
+        self.histograms = {variable: SparseHistogram() for variable in VARIABLES}
+
+    def fill(self, events: Events, weight: float | np.ndarray = 1.0) -> Self:
+        masks = passing_objects(events)
+        class_ids = pack_class_ids(object_counts(masks))
+        weights = np.broadcast_to(np.asarray(weight, dtype=np.float64), class_ids.shape)
+
+        self.counts += np.bincount(class_ids, minlength=N_CLASS_IDS)
+        self.sumw += np.bincount(class_ids, weights=weights, minlength=N_CLASS_IDS)
+        self.sumw2 += np.bincount(class_ids, weights=weights**2, minlength=N_CLASS_IDS)
+
+        for variable, values in kinematics(events, masks).items():
+            bin_width, n_bins = VARIABLES[variable]
+            bins = np.minimum((values // bin_width).astype(np.int64), n_bins - 1)
+            keys = class_ids * n_bins + bins
+            # pre-reduce the chunk so the merge only sees its non-empty bins
+            unique_keys, inverse = np.unique(keys, return_inverse=True)
+            self.histograms[variable].add(
+                unique_keys,
+                np.bincount(inverse, weights=weights),
+                np.bincount(inverse, weights=weights**2),
+            )
+
+        return self
+
+    def __iadd__(self, other: EventClasses) -> Self:
+        self.counts += other.counts
+        self.sumw += other.sumw
+        self.sumw2 += other.sumw2
+        for variable, histogram in other.histograms.items():
+            self.histograms[variable] += histogram
+        return self
+
+    def yields(self) -> dict[str, float]:
+        """
+        Weighted yield of every non-empty exclusive class.
+        """
+        return {
+            class_name(int(class_id)): float(self.sumw[class_id])
+            for class_id in np.flatnonzero(self.counts)
+        }
+
+    def _grid(self) -> np.ndarray:
+        # axis i = multiplicity of the i-th object, reversed since it sits in the higher bits
+        return self.counts.reshape(CLASSES_SHAPE[::-1])
+
+    def exclusive(self) -> dict[str, int]:
+        return self._named(self.counts, "")
+
+    def inclusive(self) -> dict[str, int]:
+        grid = self._grid()
+        for axis in range(grid.ndim):
+            grid = np.flip(np.cumsum(np.flip(grid, axis), axis=axis), axis)
+        return self._named(grid.ravel(), "+X")
+
+    def jet_inclusive(self) -> dict[str, int]:
+        jets_axis = len(OBJECTS) - 1 - list(OBJECTS).index("jets")
+        grid = np.flip(
+            np.cumsum(np.flip(self._grid(), jets_axis), jets_axis), jets_axis
+        )
+        return self._named(grid.ravel(), "+NJet")
+
+    @staticmethod
+    def _named(counts: np.ndarray, suffix: str) -> dict[str, int]:
+        return {
+            class_name(int(class_id), suffix): int(counts[class_id])
+            for class_id in np.flatnonzero(counts)
+        }
+
+    def report(self) -> str:
+        exclusive = sorted(self.exclusive().items(), key=lambda item: -item[1])
+        yields = self.yields()
+        return "\n".join(
+            f"{name:<40}{count:>12}{yields[name]:>16.4g}" for name, count in exclusive
+        )
@@ -1,167 +1,729 @@
 from __future__ import annotations
 
-import subprocess
-from pathlib import Path
+import os
+import time
+from collections import OrderedDict
 from threading import local
-from typing import Any
+from typing import Any, Iterator, Self
 
 import awkward as ak
+import numpy as np
 import uproot
 import vector
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, PrivateAttr
 
-from .redirectors import Redirectors
+from .cache import fetch_nanoaod
+from .duplicates import EVENT_ID_BRANCHES, duplicate_mask
+from .eras import NanoADODVersion
+from .lumi_mask import get_lumi_mask
+from .preselection import COUNT_BRANCHES, Preselection, entry_runs
+from .profiling import stage
+from .redirectors import get_selector
+from .skim import SkimTree, skim_path, write_skim
 
 vector.register_awkward()  # <- important
 
 
 def load_file(file_lfn: str, enable_cache: bool) -> uproot.TTree:
-    if enable_cache:
-        local_path = Path(f"nanoaod_files_cache/{file_lfn.replace('/', '_')}")
-        if local_path.exists():
-            print("File already cached...")
+    with stage("load_file", file=file_lfn):
+        if enable_cache:
+            local_path = fetch_nanoaod(file_lfn)
             nanoaod_file = uproot.open(f"{str(local_path)}:Events")
             return nanoaod_file  # type: ignore
-        else:
-            print(f"Caching {file_lfn}...")
-            for redirector in Redirectors:
-                try:
-                    subprocess.run(
-                        f"xrdcp {redirector}{file_lfn} {str(local_path)}",
-                        check=True,
-                        shell=True,
-                    )
-                    nanoaod_file = uproot.open(f"{str(local_path)}:Events")
-                    return nanoaod_file  # type: ignore
-                except:
-                    continue
-            raise RuntimeError("File is not accessible by any redirector")
-
-    for redirector in Redirectors:
-        try:
-            nanoaod_file = uproot.open(f"{redirector}{file_lfn}:Events")
-            return nanoaod_file  # type: ignore
-        except:
-            continue
 
-    raise RuntimeError("File is not accessible by any redirector")
+        nanoaod_file = get_selector().run(
+            lambda redirector: uproot.open(f"{redirector}{file_lfn}:Events")
+        )
+        return nanoaod_file  # type: ignore
 
 
-class Events(BaseModel):
-    input_file: str
-    muons: Any
-    electrons: Any
-    jets: Any
-    met: Any
+DEFAULT_STEP_SIZE = 100_000
 
-    @staticmethod
-    def build_events(input_file: str, enable_cache: bool) -> "Events":
-        # muons
-        MUON_PREFIX = "Muon_"
-        evts = load_file(input_file, enable_cache)
-
-        _muons = evts.arrays(
-            [
-                "Muon_pt",
-                "Muon_eta",
-                "Muon_phi",
-                "Muon_mass",
-                "Muon_charge",
-            ]
+MUON_MASS = 0.105_658_374_5
+ELECTRON_MASS = 0.000511
+
+
+class CollectionSchema(BaseModel):
+    """
+    Branches <prefix><field> of a collection, with the dtype each field is built with, and
+    constant values of the fields a NanoAOD version does not store (e.g. Muon_mass).
+    """
+
+    prefix: str
+    fields: dict[str, str]
+    defaults: dict[str, float] = {}
+    # one entry per event (e.g. MET) instead of a list of objects
+    singleton: bool = False
+
+
+_FLOAT = "float32"
+
+DEFAULT_SCHEMA: dict[str, CollectionSchema] = {
+    "muons": CollectionSchema(
+        prefix="Muon_",
+        fields={
+            "pt": _FLOAT,
+            "eta": _FLOAT,
+            "phi": _FLOAT,
+            "mass": _FLOAT,
+            "charge": "int32",
+        },
+        defaults={"mass": MUON_MASS},
+    ),
+    "electrons": CollectionSchema(
+        prefix="Electron_",
+        fields={
+            "pt": _FLOAT,
+            "eta": _FLOAT,
+            "phi": _FLOAT,
+            "mass": _FLOAT,
+            "charge": "int32",
+        },
+        defaults={"mass": ELECTRON_MASS},
+    ),
+    "jets": CollectionSchema(
+        prefix="Jet_",
+        fields={"pt": _FLOAT, "eta": _FLOAT, "phi": _FLOAT, "mass": _FLOAT},
+    ),
+    "met": CollectionSchema(
+        prefix="PuppiMET_",
+        fields={"pt": _FLOAT, "phi": _FLOAT},
+        defaults={"mass": 0.0, "eta": 0.0},
+        singleton=True,
+    ),
+}
+
+# collections of each NanoAOD version, a version only needs its own schema when its branches differ
+SCHEMAS: dict[NanoADODVersion, dict[str, CollectionSchema]] = {
+    version: DEFAULT_SCHEMA for version in NanoADODVersion
+}
+
+
+def collection_schema(
+    nanoaod_version: str | None = None,
+) -> dict[str, CollectionSchema]:
+    if nanoaod_version is None:
+        return DEFAULT_SCHEMA
+    return SCHEMAS.get(NanoADODVersion(nanoaod_version), DEFAULT_SCHEMA)
+
+
+LUMI_BRANCHES = ["run", "luminosityBlock"]
+
+# per event generator weight of simulation
+GEN_WEIGHT_BRANCH = "genWeight"
+
+
+def skim_branches(nanoaod_version: str | None = None) -> list[str]:
+    """
+    Branches copied to skims: the collections of the NanoAOD version, and those needed to
+    preselect, lumi mask, check for duplicates and weight.
+    """
+    return (
+        [
+            f"{schema.prefix}{field}"
+            for schema in collection_schema(nanoaod_version).values()
+            for field in schema.fields
+        ]
+        + list(COUNT_BRANCHES.values())
+        + EVENT_ID_BRANCHES
+        + [GEN_WEIGHT_BRANCH]
+    )
+
+
+# trees kept open between calls, most recently used last (see open_events_tree)
+_open_trees: OrderedDict[tuple, uproot.TTree | SkimTree] = OrderedDict()
+
+
+def open_events_tree(
+    file_lfn: str,
+    enable_cache: bool,
+    enable_skim_cache: bool = False,
+    nanoaod_version: str | None = None,
+) -> uproot.TTree | SkimTree:
+    """
+    Events tree of file_lfn. With enable_skim_cache, the first call copies the branches Events
+    needs to a local Arrow skim and every call reads from that skim instead of the NanoAOD file.
+
+    If LEPZOO_OPEN_TREES is set (e.g. by `lepzoo daemon`), that many recently used trees are kept
+    open, with their connection and uproot's in-memory basket cache, and reused by later calls.
+    """
+    max_open = int(os.environ.get("LEPZOO_OPEN_TREES", "0"))
+    if max_open <= 0:
+        return _open_events_tree(
+            file_lfn, enable_cache, enable_skim_cache, nanoaod_version
         )
 
-        if "Muon_mass" not in ak.fields(_muons):
-            muon_mass = 0.105_658_374_5
-            _muons = ak.with_field(
-                _muons, ak.ones_like(_muons["Muon_pt"]) * muon_mass, "Muon_mass"
+    key = (file_lfn, enable_cache, enable_skim_cache, nanoaod_version)
+    if key in _open_trees:
+        _open_trees.move_to_end(key)
+        return _open_trees[key]
+
+    tree = _open_events_tree(file_lfn, enable_cache, enable_skim_cache, nanoaod_version)
+    _open_trees[key] = tree
+    while len(_open_trees) > max_open:
+        _, evicted = _open_trees.popitem(last=False)
+        if not isinstance(evicted, SkimTree):
+            evicted.file.close()
+
+    return tree
+
+
+def _open_events_tree(
+    file_lfn: str,
+    enable_cache: bool,
+    enable_skim_cache: bool,
+    nanoaod_version: str | None,
+) -> uproot.TTree | SkimTree:
+    if not enable_skim_cache:
+        return load_file(file_lfn, enable_cache)
+
+    # the skim is keyed by the branches it holds, which depend on the NanoAOD version
+    branches = skim_branches(nanoaod_version)
+    path = skim_path(file_lfn, branches, nanoaod_version)
+    if not path.exists():
+        print(f"Skimming {file_lfn}...")
+        evts = load_file(file_lfn, enable_cache)
+        keys = set(evts.keys())
+        with stage("skim", file=file_lfn):
+            write_skim(
+                evts, [b for b in branches if b in keys], path, DEFAULT_STEP_SIZE
             )
 
-        muons = ak.zip(
-            {f[len(MUON_PREFIX) :]: _muons[f] for f in ak.fields(_muons)},
-            with_name="Momentum4D",
-        )
-        print(ak.count(muons, axis=-1))
-
-        # electrons
-        ELECTRON_PREFIX = "Electron_"
-
-        _electrons = evts.arrays(
-            [
-                "Electron_pt",
-                "Electron_eta",
-                "Electron_phi",
-                "Electron_mass",
-                "Electron_charge",
-            ]
+    return SkimTree(path)
+
+
+def requested_bytes(tree: uproot.TTree | SkimTree) -> int:
+    if isinstance(tree, SkimTree):
+        return tree.num_requested_bytes
+    return tree.file.source.num_requested_bytes
+
+
+def cluster_offsets(tree: uproot.TTree | SkimTree, branches: list[str]) -> list[int]:
+    """
+    Entries at which all the branches start a new basket: reading entries of a cluster
+    decompresses the whole cluster, and only the clusters read are requested from the source.
+    """
+    if isinstance(tree, SkimTree):
+        # uncompressed and memory-mapped: any range is a zero-copy slice
+        return [0, tree.num_entries]
+    return list(tree.common_entry_offsets(filter_name=branches))
+
+
+def skipped_bytes(
+    tree: uproot.TTree | SkimTree,
+    branches: list[str],
+    entry_start: int,
+    entry_stop: int,
+    runs: list[tuple[int, int]],
+) -> int:
+    """
+    Compressed bytes of the baskets of branches in [entry_start, entry_stop) that no entry run
+    touches, i.e. that were not requested thanks to the preselection.
+    """
+    if isinstance(tree, SkimTree):
+        return 0
+
+    run_starts = np.array([start for start, _ in runs], dtype=np.int64)
+    run_stops = np.array([stop for _, stop in runs], dtype=np.int64)
+    skipped = 0
+    for branch in branches:
+        b = tree[branch]
+        offsets = np.asarray(b.entry_offsets, dtype=np.int64)
+        # only the baskets inside [entry_start, entry_stop)
+        first = np.searchsorted(offsets, entry_start)
+        last = np.searchsorted(offsets, entry_stop, side="right") - 1
+        if last <= first:
+            continue
+        starts, stops = offsets[first:last], offsets[first + 1 : last + 1]
+        # runs are sorted and disjoint: only the last one starting before a basket ends can
+        # overlap it
+        touched = np.zeros(len(starts), dtype=bool)
+        if runs:
+            i = np.searchsorted(run_starts, stops, side="left") - 1
+            touched = (i >= 0) & (run_stops[np.maximum(i, 0)] > starts)
+        basket_bytes = np.asarray(b.member("fBasketBytes"), dtype=np.int64)
+        skipped += int(basket_bytes[first:last][~touched].sum())
+    return skipped
+
+
+def available_branches(
+    evts: uproot.TTree,
+    collections: list[str] | None = None,
+    nanoaod_version: str | None = None,
+) -> list[str]:
+    """
+    Branches of the requested collections present in the tree (e.g. Muon_mass is not stored in every NanoAOD version).
+    """
+    schemas = collection_schema(nanoaod_version)
+    if collections is None:
+        collections = list(schemas)
+
+    keys = set(evts.keys())
+    return [
+        f"{schemas[c].prefix}{field}"
+        for c in collections
+        for field in schemas[c].fields
+        if f"{schemas[c].prefix}{field}" in keys
+    ]
+
+
+def _unwrap(layout: ak.contents.Content) -> ak.contents.Content:
+    # entries selected by a mask (IndexedArray) or read back from an Arrow skim (option types
+    # without missing values)
+    while layout.is_indexed or layout.is_option:
+        layout = layout.project()
+    return layout
+
+
+def _flat_values(layout: ak.contents.Content, dtype: str) -> np.ndarray:
+    layout = _unwrap(layout)
+    if isinstance(layout, ak.contents.NumpyArray):
+        values = np.asarray(layout.data)
+    else:
+        values = ak.to_numpy(ak.Array(layout))
+    return values.astype(dtype, copy=False)
+
+
+def build_collection(
+    name: str, arrays: ak.Array, nanoaod_version: str | None = None
+) -> ak.Array:
+    """
+    Momentum4D records of a collection, built directly on the buffers read: all fields share the
+    offsets of the first one, and the defaults are zero-stride constants instead of full arrays.
+    """
+    schema = collection_schema(nanoaod_version)[name]
+    names = [f for f in schema.fields if f"{schema.prefix}{f}" in arrays.fields]
+
+    offsets = None
+    contents = []
+    for field in names:
+        layout = _unwrap(ak.to_layout(arrays[f"{schema.prefix}{field}"]))
+        if not schema.singleton:
+            # to_ListOffsetArray64 copies the offsets even when there is nothing to convert
+            if not (
+                isinstance(layout, ak.contents.ListOffsetArray)
+                and layout.offsets[0] == 0
+            ):
+                layout = layout.to_ListOffsetArray64(True)
+            if offsets is None:
+                offsets = layout.offsets
+            layout = layout.content[: layout.offsets[-1]]
+        contents.append(
+            ak.contents.NumpyArray(_flat_values(layout, schema.fields[field]))
         )
 
-        if "Electron_mass" not in ak.fields(_electrons):
-            electron_mass = 0.000511
-            _electrons = ak.with_field(
-                _electrons,
-                ak.ones_like(_electrons["Electron_pt"]) * electron_mass,
-                "Electron_mass",
+    length = len(arrays) if schema.singleton else int(offsets[-1])  # type: ignore[union-attr]
+    for field, value in schema.defaults.items():
+        if field not in names:
+            names.append(field)
+            contents.append(
+                ak.contents.NumpyArray(
+                    np.broadcast_to(
+                        np.asarray(value, dtype=schema.fields.get(field, _FLOAT)),
+                        (length,),
+                    )
+                )
             )
 
-        electrons = ak.zip(
-            {f[len(ELECTRON_PREFIX) :]: _electrons[f] for f in ak.fields(_electrons)},
-            with_name="Momentum4D",
-        )
-        print(ak.count(electrons, axis=-1))
-
-        # jets
-        JET_PREFIX = "Jet_"
-
-        _jets = evts.arrays(
-            [
-                "Jet_pt",
-                "Jet_eta",
-                "Jet_phi",
-                "Jet_mass",
-            ]
-        )
+    for field, content in zip(names, contents):
+        if len(content) != length:
+            raise ValueError(
+                f"{schema.prefix}{field} does not have the multiplicity of {schema.prefix}{names[0]}"
+            )
 
-        jets = ak.zip(
-            {f[len(JET_PREFIX) :]: _jets[f] for f in ak.fields(_jets)},
-            with_name="Momentum4D",
-        )
-        print(ak.count(jets, axis=-1))
-        print(len(ak.count(jets, axis=-1)))
+    layout = ak.contents.RecordArray(
+        contents, names, length=length, parameters={"__record__": "Momentum4D"}
+    )
+    if offsets is not None:
+        layout = ak.contents.ListOffsetArray(offsets, layout)
 
-        # met
-        MET_PREFIX = "PuppiMET_"
+    return ak.Array(layout)
 
-        _met = evts.arrays(
-            [
-                "PuppiMET_pt",
-                "PuppiMET_phi",
-            ]
-        )
 
-        if "PuppiMET_mass" not in ak.fields(_met):
-            _met = ak.with_field(
-                _met,
-                ak.zeros_like(_met["PuppiMET_pt"]),
-                "PuppiMET_mass",
+class Events(BaseModel):
+    """
+    Physics objects of one file (or one entry range of it).
+
+    Collections are read lazily: the branches of muons/electrons/jets/met are only read and
+    decompressed on first access, then memoized for the lifetime of the object.
+    """
+
+    input_file: str
+    tree: Any = Field(default=None, repr=False)
+    # selects the collection schema (see SCHEMAS)
+    nanoaod_version: str | None = None
+    entry_start: int | None = None
+    entry_stop: int | None = None
+    preselection: Preselection | None = None
+    # certified luminosity blocks, for data
+    golden_json: str | None = None
+    # events in these duplicate indexes (see duplicates.build_index) are dropped, for data
+    duplicate_indexes: list[str] = []
+    # also read genWeight along with the collections, for simulation
+    with_gen_weight: bool = False
+    branches_read: list[str] = []
+    bytes_read: int = 0
+    # when filtered (see is_filtered)
+    n_entries: int | None = None
+    n_passing: int | None = None
+    bytes_skipped: int = 0
+    # wall time [s] and bytes read of the preselection pass and of the collections
+    preselect_time: float = 0.0
+    preselect_bytes: int = 0
+    read_time: float = 0.0
+    _collections: dict[str, Any] = PrivateAttr(default_factory=dict)
+    _gen_weight: np.ndarray | None = PrivateAttr(default=None)
+    _preselected: tuple[np.ndarray, list[tuple[int, int]]] | None = PrivateAttr(
+        default=None
+    )
+
+    @property
+    def muons(self) -> ak.Array:
+        return self.collection("muons")
+
+    @property
+    def electrons(self) -> ak.Array:
+        return self.collection("electrons")
+
+    @property
+    def jets(self) -> ak.Array:
+        return self.collection("jets")
+
+    @property
+    def met(self) -> ak.Array:
+        return self.collection("met")
+
+    @property
+    def gen_weight(self) -> np.ndarray:
+        """
+        genWeight of every event, read in the same pass as the collections.
+        """
+        if not self.with_gen_weight:
+            raise ValueError("Events were opened without with_gen_weight")
+        if self._gen_weight is None:
+            self.materialize()
+        assert self._gen_weight is not None
+        return self._gen_weight
+
+    def collection(self, name: str) -> ak.Array:
+        if name not in self._collections:
+            self.materialize(name)
+        return self._collections[name]
+
+    def preselect(self) -> tuple[np.ndarray, list[tuple[int, int]]]:
+        """
+        Evaluate the lumi mask, the duplicate removal and the preselection on their cheap branches
+        only: the mask of passing entries and the entry runs (whole clusters) the collections have
+        to be read from.
+        """
+        if self._preselected is not None:
+            return self._preselected
+
+        if (
+            isinstance(self.tree, SkimTree)
+            and self.preselection is not None
+            and self.preselection.triggers
+        ):
+            raise ValueError(
+                "Trigger preselection is not available with the skim cache"
             )
 
-        if "PuppiMET_eta" not in ak.fields(_met):
-            _met = ak.with_field(
-                _met,
-                ak.zeros_like(_met["PuppiMET_pt"]),
-                "PuppiMET_eta",
+        with stage(
+            "preselect",
+            file=self.input_file,
+            entry_start=self.entry_start,
+            entry_stop=self.entry_stop,
+        ) as record:
+            time_before = time.perf_counter()
+            bytes_before = requested_bytes(self.tree)
+            branches = []
+            if self.preselection is not None:
+                branches += self.preselection.branches(set(self.tree.keys()))
+            if self.golden_json is not None:
+                branches += LUMI_BRANCHES
+            if self.duplicate_indexes:
+                branches += EVENT_ID_BRANCHES
+            branches = list(dict.fromkeys(branches))
+            arrays = self.tree.arrays(
+                branches, entry_start=self.entry_start, entry_stop=self.entry_stop
             )
 
-        met = ak.zip(
-            {f[len(MET_PREFIX) :]: _met[f] for f in ak.fields(_met)},
-            with_name="Momentum4D",
+            passing = np.ones(len(arrays), dtype=bool)
+            if self.preselection is not None:
+                passing &= self.preselection.mask(arrays)
+            if self.golden_json is not None:
+                passing &= get_lumi_mask(self.golden_json).mask(
+                    arrays["run"], arrays["luminosityBlock"]
+                )
+            if self.duplicate_indexes:
+                passing &= ~duplicate_mask(
+                    self.duplicate_indexes,
+                    arrays["run"],
+                    arrays["luminosityBlock"],
+                    arrays["event"],
+                )
+
+            bytes_read = requested_bytes(self.tree) - bytes_before
+            if record is not None:
+                record.bytes_read = bytes_read
+                record.args["n_passing"] = int(passing.sum())
+        self.bytes_read += bytes_read
+        self.preselect_bytes += bytes_read
+        self.branches_read += branches
+
+        start = 0 if self.entry_start is None else self.entry_start
+        runs = entry_runs(
+            cluster_offsets(
+                self.tree,
+                available_branches(self.tree, nanoaod_version=self.nanoaod_version),
+            ),
+            passing,
+            start,
         )
-        print(ak.count(met, axis=-1))
+        self.n_entries = len(passing)
+        self.n_passing = int(passing.sum())
+        self._preselected = (passing, runs)
+        self.preselect_time += time.perf_counter() - time_before
+
+        return self._preselected
+
+    @property
+    def is_filtered(self) -> bool:
+        return (
+            self.preselection is not None
+            or self.golden_json is not None
+            or bool(self.duplicate_indexes)
+        )
+
+    def _read_passing(self, branches: list[str]) -> ak.Array:
+        passing, runs = self.preselect()
+        first = 0 if self.entry_start is None else self.entry_start
+        self.bytes_skipped += skipped_bytes(
+            self.tree, branches, first, first + len(passing), runs
+        )
+        if not runs:
+            return self.tree.arrays(branches, entry_start=first, entry_stop=first)
+
+        chunks = [
+            self.tree.arrays(branches, entry_start=start, entry_stop=stop)
+            for start, stop in runs
+        ]
+        arrays = chunks[0] if len(chunks) == 1 else ak.concatenate(chunks)
 
+        # the clusters read still hold failing entries
+        return arrays[
+            np.concatenate(
+                [passing[start - first : stop - first] for start, stop in runs]
+            )
+        ]
+
+    def materialize(self, *names: str) -> Self:
+        """
+        Read the given collections (all of them by default), and genWeight if requested, in a
+        single pass. With a preselection, a golden JSON or duplicate indexes, only the clusters
+        holding passing entries are read and the collections only hold the passing entries.
+        """
+        if not names:
+            names = tuple(collection_schema(self.nanoaod_version))
+
+        pending = [n for n in names if n not in self._collections]
+        read_gen_weight = self.with_gen_weight and self._gen_weight is None
+        if not pending and not read_gen_weight:
+            return self
+
+        branches = available_branches(self.tree, pending, self.nanoaod_version)
+        if read_gen_weight:
+            branches.append(GEN_WEIGHT_BRANCH)
+        if self.is_filtered:
+            self.preselect()
+
+        with stage(
+            "read",
+            file=self.input_file,
+            entry_start=self.entry_start,
+            entry_stop=self.entry_stop,
+        ) as record:
+            time_before = time.perf_counter()
+            bytes_before = requested_bytes(self.tree)
+            if not self.is_filtered:
+                arrays = self.tree.arrays(
+                    branches, entry_start=self.entry_start, entry_stop=self.entry_stop
+                )
+            else:
+                arrays = self._read_passing(branches)
+            self.read_time += time.perf_counter() - time_before
+            bytes_read = requested_bytes(self.tree) - bytes_before
+            if record is not None:
+                record.bytes_read = bytes_read
+        self.bytes_read += bytes_read
+        self.branches_read += branches
+
+        with stage("build", file=self.input_file, collections=pending):
+            for name in pending:
+                self._collections[name] = build_collection(
+                    name, arrays, self.nanoaod_version
+                )
+            if read_gen_weight:
+                self._gen_weight = _flat_values(
+                    ak.to_layout(arrays[GEN_WEIGHT_BRANCH]), "float64"
+                )
+
+        return self
+
+    @property
+    def time_saved(self) -> float:
+        """
+        Estimated read time saved by the preselection: what reading the skipped baskets would have
+        taken at the rate of the collection read, minus the time of the preselection pass (negative
+        when it costs more than it saves). An upper bound, since reading the passing clusters one
+        run at a time costs more per byte than a single pass.
+        """
+        read_bytes = self.bytes_read - self.preselect_bytes
+        if not self.is_filtered or read_bytes <= 0:
+            return -self.preselect_time
+        return self.read_time * self.bytes_skipped / read_bytes - self.preselect_time
+
+    def read_report(self) -> dict[str, Any]:
+        """
+        Which branches were actually read, and how many bytes were requested from the source.
+        When filtered (see is_filtered), also how many entries passed, the compressed bytes of
+        the baskets it saved reading and the estimated time it saved.
+        """
+        return {
+            "input_file": self.input_file,
+            "entry_start": self.entry_start,
+            "entry_stop": self.entry_stop,
+            "collections": list(self._collections),
+            "branches_read": self.branches_read,
+            "bytes_read": self.bytes_read,
+            "n_entries": self.n_entries,
+            "n_passing": self.n_passing,
+            "bytes_skipped": self.bytes_skipped,
+            "preselect_time": self.preselect_time,
+            "read_time": self.read_time,
+            "time_saved": self.time_saved,
+        }
+
+    @staticmethod
+    def build_events(
+        input_file: str,
+        enable_cache: bool,
+        enable_skim_cache: bool = False,
+        nanoaod_version: str | None = None,
+        entry_start: int | None = None,
+        entry_stop: int | None = None,
+        preselection: Preselection | None = None,
+        golden_json: str | None = None,
+        duplicate_indexes: list[str] | None = None,
+        with_gen_weight: bool = False,
+    ) -> "Events":
+        """
+        Read all collections of the whole file (or of an entry range of it) in one pass.
+        """
+        return Events.lazy_events(
+            input_file,
+            enable_cache,
+            enable_skim_cache,
+            nanoaod_version,
+            entry_start,
+            entry_stop,
+            preselection,
+            golden_json,
+            duplicate_indexes,
+            with_gen_weight,
+        ).materialize()
+
+    @staticmethod
+    def lazy_events(
+        input_file: str,
+        enable_cache: bool,
+        enable_skim_cache: bool = False,
+        nanoaod_version: str | None = None,
+        entry_start: int | None = None,
+        entry_stop: int | None = None,
+        preselection: Preselection | None = None,
+        golden_json: str | None = None,
+        duplicate_indexes: list[str] | None = None,
+        with_gen_weight: bool = False,
+    ) -> "Events":
+        """
+        Open the file without reading any collection. Collections will only hold the entries in
+        [entry_start, entry_stop) passing the preselection, in the golden JSON and not in the
+        duplicate indexes.
+        """
         return Events(
             input_file=input_file,
-            muons=muons,
-            electrons=electrons,
-            jets=jets,
-            met=met,
+            tree=open_events_tree(
+                input_file, enable_cache, enable_skim_cache, nanoaod_version
+            ),
+            nanoaod_version=nanoaod_version,
+            entry_start=entry_start,
+            entry_stop=entry_stop,
+            preselection=preselection,
+            golden_json=golden_json,
+            duplicate_indexes=duplicate_indexes or [],
+            with_gen_weight=with_gen_weight,
         )
+
+    @staticmethod
+    def iterate_events(
+        input_file: str,
+        enable_cache: bool,
+        step_size: int = DEFAULT_STEP_SIZE,
+        entry_start: int | None = None,
+        entry_stop: int | None = None,
+        enable_skim_cache: bool = False,
+        nanoaod_version: str | None = None,
+        preselection: Preselection | None = None,
+        golden_json: str | None = None,
+        duplicate_indexes: list[str] | None = None,
+        with_gen_weight: bool = False,
+    ) -> Iterator["Events"]:
+        """
+        Stream the file in lazy chunks of step_size entries.
+
+        Peak memory is bounded by step_size, not by the file size.
+        """
+        evts = open_events_tree(
+            input_file, enable_cache, enable_skim_cache, nanoaod_version
+        )
+        start = 0 if entry_start is None else entry_start
+        stop = (
+            evts.num_entries
+            if entry_stop is None
+            else min(entry_stop, evts.num_entries)
+        )
+        for chunk_start in range(start, stop, step_size):
+            yield Events(
+                input_file=input_file,
+                tree=evts,
+                nanoaod_version=nanoaod_version,
+                entry_start=chunk_start,
+                entry_stop=min(chunk_start + step_size, stop),
+                preselection=preselection,
+                golden_json=golden_json,
+                duplicate_indexes=duplicate_indexes or [],
+                with_gen_weight=with_gen_weight,
+            )
+
+    @staticmethod
+    def from_arrays(
+        input_file: str, arrays: ak.Array, nanoaod_version: str | None = None
+    ) -> "Events":
+        """
+        Build all collections from already read NanoAOD branches.
+        """
+        events = Events(
+            input_file=input_file,
+            nanoaod_version=nanoaod_version,
+            branches_read=ak.fields(arrays),
+        )
+        for name in collection_schema(nanoaod_version):
+            events._collections[name] = build_collection(name, arrays, nanoaod_version)
+        if GEN_WEIGHT_BRANCH in arrays.fields:
+            events.with_gen_weight = True
+            events._gen_weight = _flat_values(
+                ak.to_layout(arrays[GEN_WEIGHT_BRANCH]), "float64"
+            )
+
+        return events
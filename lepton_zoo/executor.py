@@ -0,0 +1,298 @@
+import contextlib
+import os
+import shlex
+import socket
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from enum import StrEnum
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from .catalog import Catalog
+from .eras import Year
+from .preselection import Preselection
+from .profiling import flush_profile
+
+
+class ParallelBackend(StrEnum):
+    GNU_PARALLEL = "gnu-parallel"
+    NATIVE = "native"
+
+
+class WorkItem(BaseModel):
+    seq: int
+    process_name: str
+    year: Year
+    file_index: int
+    # a batch of small files: file_index, file_index + 1, ..., file_index + n_files - 1
+    n_files: int = 1
+    entry_start: int | None = None
+    entry_stop: int | None = None
+    enable_cache: bool = False
+    enable_skim_cache: bool = False
+    step_size: int = 100_000
+    # files of a batch downloaded ahead with enable_cache
+    prefetch_depth: int = 2
+    results_dir: Path = Path("classification_results")
+    preselection: Preselection | None = None
+    # only the errors are printed (to the job's stderr)
+    silence_mode: bool = True
+
+    def command(self, parsed_datasets_file: Path) -> str:
+        """
+        Equivalent `lepzoo classification run-serial` shell command, reading the catalog of
+        parsed_datasets_file.
+        """
+        cmd = f"lepzoo classification run-serial {shlex.quote(self.process_name)} {self.year} --file-index {self.file_index} --parsed-datasets-file {shlex.quote(str(parsed_datasets_file))} --results-dir {shlex.quote(str(self.results_dir))}"
+        if self.silence_mode:
+            cmd += " --silence-mode"
+        if self.n_files > 1:
+            cmd += f" --n-files {self.n_files}"
+        if self.entry_start is not None:
+            cmd += f" --entry-start {self.entry_start}"
+        if self.entry_stop is not None:
+            cmd += f" --entry-stop {self.entry_stop}"
+        if self.enable_cache:
+            cmd += " --enable-cache"
+        if self.enable_skim_cache:
+            cmd += " --enable-skim-cache"
+        if self.step_size != 100_000:
+            cmd += f" --step-size {self.step_size}"
+        if self.prefetch_depth != 2:
+            cmd += f" --prefetch-depth {self.prefetch_depth}"
+        if self.preselection is not None:
+            cmd += self.preselection.cli_args()
+        return cmd
+
+
+class JobResult(BaseModel):
+    seq: int
+    start_time: float
+    run_time: float
+    exit_value: int
+    received_bytes: int
+
+
+# per worker state, opened once by the pool initializer and kept warm between jobs
+_worker_catalog: Catalog | None = None
+
+
+def _init_worker(catalog_file: Path) -> None:
+    global _worker_catalog
+    _worker_catalog = Catalog(catalog_file)
+
+
+def _run_work_item(item: WorkItem, results_dir: Path) -> JobResult:
+    from .classification import run_classification
+    from .manifest import JobManifest, config_hash
+    from .results import result_path
+
+    output_dir = results_dir / str(item.seq)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stdout_path = output_dir / "stdout"
+    stderr_path = output_dir / "stderr"
+
+    start_time = time.time()
+    exit_value = 0
+    with (
+        stdout_path.open("w", encoding="utf-8") as out,
+        stderr_path.open("w", encoding="utf-8") as err,
+        contextlib.redirect_stdout(out),
+        contextlib.redirect_stderr(err),
+    ):
+        try:
+            assert _worker_catalog is not None
+            lfns = [
+                _worker_catalog.lfn(item.process_name, item.year, i)
+                for i in range(item.file_index, item.file_index + item.n_files)
+            ]
+            dataset = _worker_catalog.dataset(item.process_name, item.year)
+            if item.enable_cache:
+                from .cache import get_cache
+
+                file_sizes = _worker_catalog.file_column(
+                    item.process_name, item.year, "file_sizes"
+                )
+                get_cache().add_known_sizes(
+                    lfns,
+                    file_sizes
+                    and file_sizes[item.file_index : item.file_index + item.n_files],
+                )
+            output_file = result_path(
+                item.results_dir,
+                item.process_name,
+                item.year,
+                item.file_index,
+                item.entry_start,
+                item.entry_stop,
+                item.n_files,
+            )
+            run_classification(
+                lfns,
+                dataset,
+                silence_mode=item.silence_mode,
+                enable_cache=item.enable_cache,
+                enable_skim_cache=item.enable_skim_cache,
+                step_size=item.step_size,
+                output_file=output_file,
+                entry_start=item.entry_start,
+                entry_stop=item.entry_stop,
+                preselection=item.preselection,
+                prefetch_depth=item.prefetch_depth,
+            )
+            manifest = JobManifest(item.results_dir)
+            config = config_hash(dataset, item.preselection)
+            for lfn in lfns:
+                manifest.record(
+                    dataset,
+                    lfn,
+                    output_file,
+                    item.entry_start,
+                    item.entry_stop,
+                    item.preselection,
+                    config,
+                )
+        except Exception:
+            traceback.print_exc()
+            exit_value = 1
+
+    # workers are not shut down through atexit
+    if item.enable_cache:
+        from .cache import get_cache
+
+        get_cache().flush_stats()
+    flush_profile()
+
+    return JobResult(
+        seq=item.seq,
+        start_time=start_time,
+        run_time=time.time() - start_time,
+        exit_value=exit_value,
+        received_bytes=stdout_path.stat().st_size + stderr_path.stat().st_size,
+    )
+
+
+def _worker_died(item: WorkItem) -> JobResult:
+    return JobResult(
+        seq=item.seq,
+        start_time=time.time(),
+        run_time=0.0,
+        exit_value=255,
+        received_bytes=0,
+    )
+
+
+def run_worker_pool(
+    items: list[WorkItem],
+    catalog_file: Path,
+    n_workers: int | None = None,
+    retries: int = 3,
+    halt_on_failure: bool = True,
+    results_dir: Path = Path("parallel_outputs"),
+    joblog: Path = Path("joblog.tsv"),
+) -> int:
+    """
+    Process work items on a fixed pool of warm worker processes.
+
+    Mirrors `parallel --retries <retries> --halt soon,fail=1 --joblog <joblog>`: a failed item is
+    attempted up to `retries` times; once an item has exhausted its attempts no new items are
+    started, the running ones are allowed to finish and the number of failed items is returned.
+
+    A worker dying (e.g. OOM kill) breaks the whole pool: it is replaced and the items that were
+    in flight are queued again without using one of their attempts. They are then run one at a
+    time, so an item that breaks the pool again is known to be the cause and is failed normally.
+    """
+    from rich.progress import Progress
+
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+
+    def new_pool() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_worker,
+            initargs=(catalog_file,),
+        )
+
+    results_dir.mkdir(parents=True, exist_ok=True)
+    host = socket.gethostname()
+    pending = list(reversed(items))
+    attempts: dict[int, int] = {}
+    # in flight when the pool broke, one of them may have caused it
+    suspects: set[int] = set()
+    failed = 0
+    halted = False
+
+    ex = new_pool()
+    try:
+        with (
+            joblog.open("w", encoding="utf-8") as log,
+            Progress() as progress,
+        ):
+            log.write(
+                "Seq\tHost\tStarttime\tJobRuntime\tSend\tReceive\tExitval\tSignal\tCommand\n"
+            )
+            task = progress.add_task("Processing...", total=len(items))
+            running: dict[Future[JobResult], WorkItem] = {}
+
+            while running or (pending and not halted):
+                max_running = 1 if suspects else 2 * n_workers
+                while pending and not halted and len(running) < max_running:
+                    item = pending.pop()
+                    attempts[item.seq] = attempts.get(item.seq, 0) + 1
+                    running[ex.submit(_run_work_item, item, results_dir)] = item
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                if any(isinstance(fut.exception(), BrokenProcessPool) for fut in done):
+                    # every other item in flight ends with the pool as well
+                    done, _ = wait(running)
+                results: list[tuple[WorkItem, JobResult]] = []
+                broken: list[WorkItem] = []
+                for fut in done:
+                    item = running.pop(fut)
+                    try:
+                        results.append((item, fut.result()))
+                    except BrokenProcessPool:
+                        broken.append(item)
+                    except Exception:
+                        traceback.print_exc()
+                        results.append((item, _worker_died(item)))
+
+                if broken:
+                    ex.shutdown(wait=False, cancel_futures=True)
+                    ex = new_pool()
+                    if len(broken) == 1:
+                        item = broken[0]
+                        results.append((item, _worker_died(item)))
+                    else:
+                        print(
+                            f"A worker died, running {len(broken)} items again one at a time..."
+                        )
+                        for item in broken:
+                            attempts[item.seq] -= 1
+                            suspects.add(item.seq)
+                            pending.append(item)
+
+                for item, result in results:
+                    suspects.discard(item.seq)
+                    log.write(
+                        f"{result.seq}\t{host}\t{result.start_time:.3f}\t{result.run_time:.3f}\t0\t{result.received_bytes}\t{result.exit_value}\t0\t{item.command(catalog_file)}\n"
+                    )
+                    log.flush()
+
+                    if result.exit_value == 0:
+                        progress.advance(task)
+                    elif attempts[item.seq] < retries:
+                        pending.append(item)
+                    else:
+                        failed += 1
+                        progress.advance(task)
+                        if halt_on_failure:
+                            halted = True
+    finally:
+        ex.shutdown()
+
+    return failed
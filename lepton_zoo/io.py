@@ -0,0 +1,40 @@
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+
+@contextmanager
+def atomic_path(
+    path: Path, suffix: str = "", tmp_dir: Path | None = None
+) -> Iterator[Path]:
+    """
+    Temporary path to write path to, renamed into place once the block completes and removed if it
+    fails, so readers (e.g. other workers) never see a partial file:
+
+        with atomic_path(path, ".npy") as tmp_path:
+            np.save(tmp_path, array)
+
+    suffix is for writers appending an extension (np.save, np.savez); tmp_dir must be on the same
+    filesystem as path (next to it by default).
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = (tmp_dir or path.parent) / f".{path.name}.{os.getpid()}.tmp{suffix}"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    with atomic_path(path) as tmp_path:
+        tmp_path.write_bytes(data)
+
+
+def atomic_write_json(path: Path, obj: Any, **kwargs: Any) -> None:
+    """
+    json.dumps(obj, **kwargs) to path, atomically.
+    """
+    atomic_write_bytes(path, json.dumps(obj, **kwargs).encode("utf-8"))
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+from .io import atomic_write_json
+
+DEFAULT_BUILD_CACHE_DIR = "build_cache"
+DEFAULT_LISTING_TTL = 24 * 3600.0
+
+# per file DBS metadata kept in the listing cache
+LISTING_FIELDS = ["logical_file_name", "file_size", "event_count", "adler32"]
+
+
+def listing_hash(files: list[dict[str, Any]]) -> str:
+    return hashlib.sha256(json.dumps(files, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class BuildCache:
+    """
+    State kept between `lepzoo build` runs, keyed by DAS name:
+
+    - listings.json: the DBS file listing and when it was fetched; it is reused until it is older
+      than ttl seconds (or refresh is set);
+    - lfns.json: the LFNs that passed the probe, with the hash of the listing they came from. If
+      the listing did not change, the LFNs are reused without probing anything.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = Path(DEFAULT_BUILD_CACHE_DIR),
+        ttl: float = DEFAULT_LISTING_TTL,
+        refresh: bool = False,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.refresh = refresh
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._listings = self._read("listings.json")
+        self._lfns = self._read("lfns.json")
+
+    def _read(self, name: str) -> dict[str, Any]:
+        path = self.cache_dir / name
+        if not path.exists():
+            return {}
+
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def listing(self, das_name: str) -> list[dict[str, Any]]:
+        """
+        DBS file listing of das_name, from the cache if it is fresh enough.
+        """
+        cached = self._listings.get(das_name)
+        if (
+            cached is not None
+            and not self.refresh
+            and time.time() - cached["time"] < self.ttl
+        ):
+            return cached["files"]
+
+        from .datasets import get_dbs
+
+        files = [
+            {field: f.get(field) for field in LISTING_FIELDS}
+            for f in get_dbs().listFiles(dataset=das_name, detail=True)
+        ]
+        for f in files:
+            f["logical_file_name"] = f["logical_file_name"].strip()
+
+        self._listings[das_name] = {"time": time.time(), "files": files}
+        atomic_write_json(self.cache_dir / "listings.json", self._listings)
+
+        return files
+
+    def lfns(self, das_name: str, files: list[dict[str, Any]]) -> list[str] | None:
+        """
+        LFNs from a previous build, if it was done on the same listing.
+        """
+        cached = self._lfns.get(das_name)
+        if cached is None or cached["listing_hash"] != listing_hash(files):
+            return None
+
+        return cached["lfns"]
+
+    def store_lfns(
+        self, das_name: str, files: list[dict[str, Any]], lfns: list[str]
+    ) -> None:
+        self._lfns[das_name] = {"listing_hash": listing_hash(files), "lfns": lfns}
+        atomic_write_json(self.cache_dir / "lfns.json", self._lfns)
+
+
+def get_build_cache() -> BuildCache:
+    """
+    Build cache configured by LEPZOO_BUILD_CACHE_DIR, LEPZOO_DBS_TTL (seconds) and
+    LEPZOO_DBS_REFRESH.
+    """
+    return BuildCache(
+        Path(os.environ.get("LEPZOO_BUILD_CACHE_DIR", DEFAULT_BUILD_CACHE_DIR)),
+        float(os.environ.get("LEPZOO_DBS_TTL", DEFAULT_LISTING_TTL)),
+        os.environ.get("LEPZOO_DBS_REFRESH", "0") == "1",
+    )
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+from functools import cache
+from pathlib import Path
+
+import numpy as np
+
+from .io import atomic_path
+
+DEFAULT_LUMI_MASK_DIR = "lumi_mask_cache"
+
+# bump when the layout of the compiled lumi masks changes
+LUMI_MASK_FORMAT_VERSION = 1
+
+
+def lumi_keys(runs: np.ndarray, lumis: np.ndarray) -> np.ndarray:
+    """
+    (run, luminosity block) pairs as sortable uint64 keys.
+    """
+    return (np.asarray(runs, dtype=np.uint64) << np.uint64(32)) | np.asarray(
+        lumis, dtype=np.uint64
+    )
+
+
+class LumiMask:
+    """
+    Certified luminosity blocks of a golden JSON ({"run": [[first, last], ...], ...}), compiled to
+    sorted, non overlapping [first, last] intervals of lumi_keys, looked up with searchsorted.
+    """
+
+    def __init__(self, firsts: np.ndarray, lasts: np.ndarray) -> None:
+        self.firsts = firsts
+        self.lasts = lasts
+
+    @staticmethod
+    def from_golden_json(golden_json: dict[str, list[list[int]]]) -> "LumiMask":
+        intervals = sorted(
+            (int(run), int(first), int(last))
+            for run, ranges in golden_json.items()
+            for first, last in ranges
+        )
+        firsts: list[int] = []
+        lasts: list[int] = []
+        for run, first, last in intervals:
+            first_key, last_key = (run << 32) | first, (run << 32) | last
+            # overlapping or adjacent ranges of a run
+            if lasts and first_key <= lasts[-1] + 1:
+                lasts[-1] = max(lasts[-1], last_key)
+                continue
+            firsts.append(first_key)
+            lasts.append(last_key)
+
+        return LumiMask(
+            np.array(firsts, dtype=np.uint64), np.array(lasts, dtype=np.uint64)
+        )
+
+    def mask(self, runs: np.ndarray, lumis: np.ndarray) -> np.ndarray:
+        """
+        Whether each (run, luminosity block) pair is certified.
+        """
+        keys = lumi_keys(runs, lumis)
+        if len(self.firsts) == 0:
+            # empty golden JSON: nothing is certified
+            return np.zeros(len(keys), dtype=bool)
+        i = np.searchsorted(self.firsts, keys, side="right") - 1
+        return (i >= 0) & (keys <= self.lasts[np.maximum(i, 0)])
+
+    def save(self, path: Path) -> None:
+        with atomic_path(path, ".npz") as tmp_path:
+            np.savez(
+                tmp_path,
+                firsts=self.firsts,
+                lasts=self.lasts,
+                format=LUMI_MASK_FORMAT_VERSION,
+            )
+
+    @staticmethod
+    def load(path: Path) -> "LumiMask | None":
+        with np.load(path) as data:
+            if int(data["format"]) != LUMI_MASK_FORMAT_VERSION:
+                return None
+            return LumiMask(data["firsts"], data["lasts"])
+
+
+def _read_golden_json(source: str) -> bytes:
+    if source.startswith(("http://", "https://")):
+        from urllib.request import urlopen
+
+        with urlopen(source, timeout=60) as response:
+            return response.read()
+    return Path(source).read_bytes()
+
+
+@cache
+def get_lumi_mask(source: str) -> LumiMask:
+    """
+    Lumi mask of a golden JSON (path or URL), loaded once per process.
+
+    The compiled intervals are kept in $LEPZOO_LUMI_MASK_DIR (default lumi_mask_cache), keyed by
+    the URL, or by the content of a local file, so workers do not parse the JSON again.
+    """
+    cache_dir = Path(os.environ.get("LEPZOO_LUMI_MASK_DIR", DEFAULT_LUMI_MASK_DIR))
+    is_url = source.startswith(("http://", "https://"))
+    content = None if is_url else _read_golden_json(source)
+    key = hashlib.sha256(content if content is not None else source.encode("utf-8"))
+    path = cache_dir / f"{Path(source).stem}.{key.hexdigest()[:16]}.npz"
+
+    if path.exists():
+        lumi_mask = LumiMask.load(path)
+        if lumi_mask is not None:
+            return lumi_mask
+
+    if content is None:
+        content = _read_golden_json(source)
+    lumi_mask = LumiMask.from_golden_json(json.loads(content))
+    lumi_mask.save(path)
+
+    return lumi_mask
@@ -0,0 +1,180 @@
+import fcntl
+import hashlib
+import json
+import time
+from functools import cache, cached_property
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from .datasets import Dataset
+from .preselection import Preselection
+
+MANIFEST_FILE = "manifest.jsonl"
+
+
+@cache
+def code_hash() -> str:
+    """
+    Digest of the lepton_zoo sources: any change to the selection, classification or result format
+    makes previous results stale.
+    """
+    digest = hashlib.sha256()
+    for source in sorted(Path(__file__).parent.glob("*.py")):
+        digest.update(source.name.encode("utf-8"))
+        digest.update(source.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def config_hash(dataset: Dataset, preselection: Preselection | None = None) -> str:
+    """
+    Identifies how a file of dataset is processed: the code, the weights applied (including the
+    generator sums normalizing them), the golden JSON, the overlapping datasets (and the content of
+    their duplicate indexes) and the preselection.
+    """
+    from .duplicates import index_path, index_summary
+
+    payload = json.dumps(
+        {
+            "code": code_hash(),
+            "xsec": dataset.xsec,
+            "filter_eff": dataset.filter_eff,
+            "k_factor": dataset.k_factor,
+            "gen_event_sumw": dataset.gen_event_sumw,
+            "golden_json": dataset.golden_json,
+            "remove_overlap_with": dataset.remove_overlap_with,
+            "overlap_indexes": [
+                index_summary(index_path(process_name, dataset.year))
+                for process_name in dataset.remove_overlap_with or []
+            ],
+            "preselection": (
+                preselection.model_dump() if preselection is not None else None
+            ),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def file_checksum(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+class ManifestEntry(BaseModel):
+    process_name: str
+    year: str
+    lfn: str
+    entry_start: int | None = None
+    entry_stop: int | None = None
+    config_hash: str
+    output: str
+    checksum: str
+    time: float
+
+
+def _unit(entry: ManifestEntry) -> tuple[str, str, str, int | None, int | None]:
+    return (
+        entry.process_name,
+        entry.year,
+        entry.lfn,
+        entry.entry_start,
+        entry.entry_stop,
+    )
+
+
+class JobManifest:
+    """
+    Append-only record of the completed (dataset, LFN, entry range, config hash) units and the
+    checksum of their output, kept next to the results. The last entry of a unit wins.
+    """
+
+    def __init__(self, results_dir: Path) -> None:
+        self.path = results_dir / MANIFEST_FILE
+        # the entries of a batch share their output, hashed once per version of it
+        self._checksums: dict[tuple[Path, int, int], str] = {}
+
+    def _checksum(self, output: Path) -> str:
+        st = output.stat()
+        key = (output, st.st_mtime_ns, st.st_size)
+        if key not in self._checksums:
+            self._checksums[key] = file_checksum(output)
+        return self._checksums[key]
+
+    @cached_property
+    def entries(
+        self,
+    ) -> dict[tuple[str, str, str, int | None, int | None], ManifestEntry]:
+        # only read when resuming, workers just append
+        entries = {}
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = ManifestEntry.model_validate_json(line)
+                    except ValueError:
+                        # line cut short by a killed job
+                        continue
+                    entries[_unit(entry)] = entry
+        return entries
+
+    def record(
+        self,
+        dataset: Dataset,
+        lfn: str,
+        output: Path,
+        entry_start: int | None = None,
+        entry_stop: int | None = None,
+        preselection: Preselection | None = None,
+        config: str | None = None,
+    ) -> None:
+        """
+        config is config_hash(dataset, preselection), if the caller already computed it.
+        """
+        assert dataset.process_name is not None
+        entry = ManifestEntry(
+            process_name=dataset.process_name,
+            year=dataset.year,
+            lfn=lfn,
+            entry_start=entry_start,
+            entry_stop=entry_stop,
+            config_hash=config or config_hash(dataset, preselection),
+            output=str(output.absolute()),
+            checksum=self._checksum(output),
+            time=time.time(),
+        )
+        if "entries" in self.__dict__:
+            self.entries[_unit(entry)] = entry
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(entry.model_dump_json() + "\n")
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+    def is_complete(
+        self,
+        dataset: Dataset,
+        lfn: str,
+        output: Path,
+        entry_start: int | None = None,
+        entry_stop: int | None = None,
+        preselection: Preselection | None = None,
+        config: str | None = None,
+    ) -> bool:
+        """
+        True if the entry range of lfn was processed with the current code, config and
+        preselection into output, and output is still there, unchanged. config is
+        config_hash(dataset, preselection), if the caller already computed it: it is the same for
+        all the files of a dataset.
+        """
+        assert dataset.process_name is not None
+        entry = self.entries.get(
+            (dataset.process_name, dataset.year, lfn, entry_start, entry_stop)
+        )
+        return (
+            entry is not None
+            and entry.config_hash == (config or config_hash(dataset, preselection))
+            and entry.output == str(output.absolute())
+            and output.exists()
+            and self._checksum(output) == entry.checksum
+        )
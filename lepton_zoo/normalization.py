@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .io import atomic_write_json
+from .listings import DEFAULT_BUILD_CACHE_DIR
+
+DEFAULT_GEN_SUMS_CONCURRENCY = 16
+DEFAULT_GEN_SUMS_TIMEOUT = 120.0
+
+
+def read_gen_sums(file_lfn: str) -> tuple[float, int]:
+    """
+    Sum of the generator weights and number of generated events of a file, from its Runs tree
+    (one entry per run, a few bytes) instead of the Events tree.
+    """
+    import numpy as np
+    import uproot
+
+    from .redirectors import get_selector
+
+    def read(redirector: str) -> tuple[float, int]:
+        with uproot.open(f"{redirector}{file_lfn}") as f:
+            runs = f["Runs"]
+            # NanoAOD before v9 suffixes the branches with an underscore
+            suffix = "" if "genEventSumw" in runs else "_"
+            arrays = runs.arrays(
+                [f"genEventSumw{suffix}", f"genEventCount{suffix}"], library="np"
+            )
+            return (
+                float(np.sum(arrays[f"genEventSumw{suffix}"], dtype=np.float64)),
+                int(np.sum(arrays[f"genEventCount{suffix}"])),
+            )
+
+    return get_selector().run(read)
+
+
+class GenSumsCache:
+    """
+    Generator sums of every LFN read by a previous build, in <build cache>/gen_sums.json. A file
+    never changes once published, so entries do not expire: a build only reads the new LFNs.
+    """
+
+    def __init__(self, cache_dir: Path | None = None) -> None:
+        if cache_dir is None:
+            cache_dir = Path(
+                os.environ.get("LEPZOO_BUILD_CACHE_DIR", DEFAULT_BUILD_CACHE_DIR)
+            )
+        self.path = cache_dir / "gen_sums.json"
+        self.sums: dict[str, list] = (
+            json.loads(self.path.read_text(encoding="utf-8"))
+            if self.path.exists()
+            else {}
+        )
+
+    def save(self) -> None:
+        atomic_write_json(self.path, self.sums)
+
+
+async def _fetch_gen_sums(
+    lfns: list[str],
+    concurrency: int,
+    timeout: float,
+    cache: GenSumsCache,
+    description: str,
+) -> None:
+    from rich.progress import Progress
+
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(lfn: str) -> tuple[str, tuple[float, int] | None]:
+        async with semaphore:
+            try:
+                return lfn, await asyncio.wait_for(
+                    asyncio.to_thread(read_gen_sums, lfn), timeout
+                )
+            except Exception as e:
+                print(f"Could not read the Runs tree of {lfn}: {e}")
+                return lfn, None
+
+    with Progress() as progress:
+        task = progress.add_task(description, total=len(lfns))
+        tasks = [asyncio.create_task(fetch(lfn)) for lfn in lfns]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                lfn, sums = await next_result
+                progress.advance(task)
+                if sums is not None:
+                    cache.sums[lfn] = list(sums)
+        finally:
+            for t in tasks:
+                t.cancel()
+
+
+def gen_sums(
+    lfns: list[str],
+    concurrency: int | None = None,
+    timeout: float | None = None,
+    description: str = "Reading generator sums...",
+) -> tuple[list[float | None], list[int | None]]:
+    """
+    genEventSumw and genEventCount of every LFN, reading the Runs tree of the LFNs not in the
+    cache, with at most `concurrency` files in flight, each bounded by `timeout` seconds. Both
+    are None for files that could not be read (they are retried on the next build).
+
+    Defaults come from LEPZOO_GEN_SUMS_CONCURRENCY and LEPZOO_GEN_SUMS_TIMEOUT.
+    """
+    if concurrency is None:
+        concurrency = int(
+            os.environ.get("LEPZOO_GEN_SUMS_CONCURRENCY", DEFAULT_GEN_SUMS_CONCURRENCY)
+        )
+    if timeout is None:
+        timeout = float(
+            os.environ.get("LEPZOO_GEN_SUMS_TIMEOUT", DEFAULT_GEN_SUMS_TIMEOUT)
+        )
+
+    cache = GenSumsCache()
+    missing = [lfn for lfn in dict.fromkeys(lfns) if lfn not in cache.sums]
+    if missing:
+        asyncio.run(_fetch_gen_sums(missing, concurrency, timeout, cache, description))
+        cache.save()
+
+    sums = [cache.sums.get(lfn, [None, None]) for lfn in lfns]
+    return [s[0] for s in sums], [s[1] for s in sums]
@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+from .cache import NanoAODCache, fetch_nanoaod, get_cache
+
+
+class Prefetcher:
+    """
+    Downloads the next `depth` files into the NanoAOD cache in the background while the current
+    one is processed.
+
+    Prefetched files are pinned in the cache until the consumer moves past them, and a new
+    prefetch only starts if the pinned files plus the largest file seen so far fit in the cache
+    size limit. The time the consumer spent waiting for downloads is kept in `stall_time`.
+    """
+
+    def __init__(
+        self, lfns: list[str], depth: int, cache: NanoAODCache | None = None
+    ) -> None:
+        self.lfns = lfns
+        self.depth = max(depth, 0)
+        self.cache = cache if cache is not None else get_cache()
+        self.stall_time = 0.0
+        self.compute_time = 0.0
+        self._largest_file = 0
+        self._lock = threading.Lock()
+
+    def _fetch(self, lfn: str) -> Path:
+        path = fetch_nanoaod(lfn)
+        with self._lock:
+            self.cache.pinned.add(path)
+            self._largest_file = max(self._largest_file, path.stat().st_size)
+        return path
+
+    def _pinned_size(self) -> int:
+        with self._lock:
+            return sum(p.stat().st_size for p in self.cache.pinned if p.exists())
+
+    def _has_room(self, in_flight: int) -> bool:
+        # the first file is always fetched, the next ones only if they fit next to the pinned ones
+        if in_flight == 0:
+            return True
+        return self._pinned_size() + self._largest_file <= self.cache.max_size
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        Yield the LFNs in order, each one once it is in the cache.
+        """
+        with ThreadPoolExecutor(
+            max_workers=max(self.depth, 1), thread_name_prefix="prefetch"
+        ) as ex:
+            queue: deque[tuple[str, Future[Path]]] = deque()
+            next_index = 0
+            try:
+                while next_index < len(self.lfns) or queue:
+                    while (
+                        next_index < len(self.lfns)
+                        and len(queue) <= self.depth
+                        and self._has_room(len(queue))
+                    ):
+                        lfn = self.lfns[next_index]
+                        queue.append((lfn, ex.submit(self._fetch, lfn)))
+                        next_index += 1
+
+                    lfn, future = queue.popleft()
+                    start = time.perf_counter()
+                    path = future.result()
+                    self.stall_time += time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    yield lfn
+                    self.compute_time += time.perf_counter() - start
+
+                    with self._lock:
+                        self.cache.pinned.discard(path)
+            finally:
+                for _, future in queue:
+                    future.cancel()
+
+    def report(self) -> str:
+        total = self.stall_time + self.compute_time
+        fraction = self.stall_time / total if total > 0 else 0.0
+        return f"Compute stalled {self.stall_time:.1f} s waiting on I/O ({fraction:.0%} of {total:.1f} s, prefetch depth {self.depth})"
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import shlex
+import warnings
+from typing import TYPE_CHECKING, Any, Sequence
+
+from pydantic import BaseModel
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# counter branches of the collections that can be preselected on
+COUNT_BRANCHES = {"muons": "nMuon", "electrons": "nElectron"}
+
+
+class Preselection(BaseModel):
+    """
+    Cheap event filter, evaluated on the counter and trigger branches before the heavy collection
+    branches are read: at least min_muons muons, min_electrons electrons and min_leptons muons +
+    electrons (before any object selection), and any of triggers fired (if given).
+    """
+
+    min_muons: int = 0
+    min_electrons: int = 0
+    min_leptons: int = 0
+    triggers: list[str] = []
+
+    def is_trivial(self) -> bool:
+        return (
+            self.min_muons <= 0
+            and self.min_electrons <= 0
+            and self.min_leptons <= 0
+            and not self.triggers
+        )
+
+    def branches(self, available: set[str]) -> list[str]:
+        """
+        Branches the mask is computed from. Triggers missing from the file are left out.
+        """
+        missing = [t for t in self.triggers if t not in available]
+        if missing:
+            warnings.warn(
+                f"Triggers {', '.join(missing)} are not in the file, they never fire"
+            )
+        return list(COUNT_BRANCHES.values()) + [
+            t for t in self.triggers if t in available
+        ]
+
+    def mask(self, arrays: Any) -> np.ndarray:
+        """
+        Passing events of the branches read by `branches`, as a numpy boolean array.
+        """
+        import numpy as np
+
+        n_muons = np.asarray(arrays[COUNT_BRANCHES["muons"]])
+        n_electrons = np.asarray(arrays[COUNT_BRANCHES["electrons"]])
+        passing = (
+            (n_muons >= self.min_muons)
+            & (n_electrons >= self.min_electrons)
+            & (n_muons + n_electrons >= self.min_leptons)
+        )
+
+        if self.triggers:
+            fired = np.zeros(len(passing), dtype=bool)
+            for trigger in self.triggers:
+                if trigger in arrays.fields:
+                    fired |= np.asarray(arrays[trigger])
+            passing &= fired
+
+        return passing
+
+    def cli_args(self) -> str:
+        args = ""
+        if self.min_muons > 0:
+            args += f" --min-muons {self.min_muons}"
+        if self.min_electrons > 0:
+            args += f" --min-electrons {self.min_electrons}"
+        if self.min_leptons > 0:
+            args += f" --min-leptons {self.min_leptons}"
+        if self.triggers:
+            args += f" --triggers {shlex.quote(','.join(self.triggers))}"
+        return args
+
+
+def make_preselection(
+    min_muons: int = 0,
+    min_electrons: int = 0,
+    min_leptons: int = 0,
+    triggers: str | None = None,
+) -> Preselection | None:
+    """
+    Preselection from the command line options (triggers comma separated), None if it keeps
+    every event.
+    """
+    preselection = Preselection(
+        min_muons=min_muons,
+        min_electrons=min_electrons,
+        min_leptons=min_leptons,
+        triggers=[t.strip() for t in (triggers or "").split(",") if t.strip()],
+    )
+    return None if preselection.is_trivial() else preselection
+
+
+def entry_runs(
+    cluster_offsets: Sequence[int],
+    passing: np.ndarray,
+    entry_start: int,
+) -> list[tuple[int, int]]:
+    """
+    Entry ranges of the clusters (entry ranges whose baskets are shared by all branches) holding
+    at least one passing entry, adjacent clusters merged. passing covers the entries from
+    entry_start on.
+    """
+    import numpy as np
+
+    if len(passing) == 0:
+        return []
+
+    entry_stop = entry_start + len(passing)
+    bounds = np.unique(
+        np.clip(
+            np.concatenate([[entry_start, entry_stop], cluster_offsets]),
+            entry_start,
+            entry_stop,
+        )
+    )
+    n_passing = np.add.reduceat(passing.astype(np.int64), bounds[:-1] - entry_start)
+
+    runs: list[tuple[int, int]] = []
+    for start, stop, n in zip(bounds[:-1].tolist(), bounds[1:].tolist(), n_passing):
+        if n == 0:
+            continue
+        if runs and runs[-1][1] == start:
+            runs[-1] = (runs[-1][0], stop)
+        else:
+            runs.append((start, stop))
+
+    return runs
@@ -0,0 +1,134 @@
+import asyncio
+import fcntl
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+DEFAULT_PROBE_CACHE = "probe_cache.jsonl"
+DEFAULT_PROBE_CONCURRENCY = 32
+DEFAULT_PROBE_TIMEOUT = 120.0
+
+
+def test_file(f: str) -> tuple[bool, str]:
+    import uproot
+
+    from .redirectors import get_selector
+
+    success = False
+    try:
+        get_selector().run(lambda redirector: uproot.open(f"{redirector}{f}").close())
+        success = True
+    except:
+        pass
+
+    return success, f
+
+
+class ProbeCache:
+    """
+    Append-only record of the LFNs that passed the probe, so an interrupted build resumes
+    where it stopped. Failed probes are not recorded: they are retried on the next build.
+    """
+
+    def __init__(self, path: Path = Path(DEFAULT_PROBE_CACHE)) -> None:
+        self.path = path
+        self.passed: set[str] = set()
+        if path.exists():
+            with path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    self.passed.add(json.loads(line)["lfn"])
+
+    def add(self, lfn: str) -> None:
+        self.passed.add(lfn)
+        with self.path.open("a", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(json.dumps({"lfn": lfn, "time": time.time()}) + "\n")
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class NotEnoughFilesError(RuntimeError):
+    pass
+
+
+async def _probe_files(
+    lfns: list[str],
+    min_fraction: float,
+    concurrency: int,
+    timeout: float,
+    cache: ProbeCache | None,
+    description: str,
+) -> list[str]:
+    from rich.progress import Progress
+
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    passed = {lfn for lfn in lfns if cache is not None and lfn in cache.passed}
+    to_probe = [lfn for lfn in lfns if lfn not in passed]
+    # once more than this many files failed, min_fraction can not be reached anymore
+    max_failures = len(lfns) - math.ceil(min_fraction * len(lfns))
+    failures = 0
+
+    async def probe(lfn: str) -> tuple[bool, str]:
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(
+                    asyncio.to_thread(test_file, lfn), timeout
+                )
+            except asyncio.TimeoutError:
+                return False, lfn
+
+    with Progress() as progress:
+        task = progress.add_task(description, total=len(lfns), completed=len(passed))
+        tasks = [asyncio.create_task(probe(lfn)) for lfn in to_probe]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                success, lfn = await next_result
+                progress.advance(task)
+                if success:
+                    passed.add(lfn)
+                    if cache is not None:
+                        cache.add(lfn)
+                    continue
+
+                failures += 1
+                if failures > max_failures:
+                    raise NotEnoughFilesError(
+                        f"{failures} of {len(lfns)} files failed the test, {min_fraction:.0%} can not be reached anymore"
+                    )
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    return [lfn for lfn in lfns if lfn in passed]
+
+
+def probe_files(
+    lfns: list[str],
+    min_fraction: float = 0.6,
+    concurrency: int | None = None,
+    timeout: float | None = None,
+    cache: ProbeCache | None = None,
+    description: str = "Processing...",
+) -> list[str]:
+    """
+    Test that the files are readable through a redirector, with at most `concurrency` probes in
+    flight, each bounded by `timeout` seconds. Returns the readable files in input order.
+
+    Raises NotEnoughFilesError as soon as less than min_fraction of the files can pass.
+    Defaults come from LEPZOO_PROBE_CONCURRENCY and LEPZOO_PROBE_TIMEOUT.
+    """
+    if concurrency is None:
+        concurrency = int(
+            os.environ.get("LEPZOO_PROBE_CONCURRENCY", DEFAULT_PROBE_CONCURRENCY)
+        )
+    if timeout is None:
+        timeout = float(os.environ.get("LEPZOO_PROBE_TIMEOUT", DEFAULT_PROBE_TIMEOUT))
+
+    return asyncio.run(
+        _probe_files(lfns, min_fraction, concurrency, timeout, cache, description)
+    )
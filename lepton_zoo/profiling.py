@@ -0,0 +1,310 @@
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import cache
+from pathlib import Path
+from typing import Any, Iterator
+
+from pydantic import BaseModel
+
+from .io import atomic_write_json
+
+
+class Span(BaseModel):
+    """
+    One timed stage. Times are in seconds, start is a Unix timestamp.
+    """
+
+    name: str
+    start: float
+    wall: float
+    # CPU time of the thread running the stage only (not of e.g. the prefetch threads)
+    cpu: float
+    bytes_read: int = 0
+    # resident set size of the process when the stage started and ended, and its peak during the
+    # stage (since the process started where the peak can not be reset) [bytes]
+    rss_start: int = 0
+    rss_end: int = 0
+    rss_peak: int = 0
+    pid: int
+    tid: int
+    args: dict[str, Any] = {}
+
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> int:
+    """
+    Current (not peak) resident set size of the process in bytes, 0 where /proc is unavailable.
+    """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return 0
+
+
+def peak_rss() -> int:
+    """
+    Peak resident set size of the process in bytes since the last reset_peak_rss (VmHWM), or
+    since it started where /proc is unavailable.
+    """
+    try:
+        with open("/proc/self/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def reset_peak_rss() -> None:
+    """
+    Reset the peak resident set size to the current one (Linux only, a no-op elsewhere).
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+class StageRecord:
+    """
+    Handle yielded by Profiler.stage, to attach the bytes read or extra args to the span.
+    """
+
+    def __init__(self) -> None:
+        self.bytes_read = 0
+        self.args: dict[str, Any] = {}
+        self.rss_peak = 0
+
+
+class Profiler:
+    """
+    Collects stage spans (wall/CPU time, bytes read, RSS) and writes them to output_dir as
+    trace_<host>_<pid>.json, a list of spans that `aggregate_traces` merges across workers.
+    """
+
+    def __init__(self, output_dir: Path) -> None:
+        self.output_dir = output_dir
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+        # stages running in any thread, whose peak RSS must survive the reset of a new stage
+        self._open: list[StageRecord] = []
+
+    @contextmanager
+    def stage(self, name: str, **args: Any) -> Iterator[StageRecord]:
+        record = StageRecord()
+        record.args.update(args)
+        with self._lock:
+            peak = peak_rss()
+            for open_record in self._open:
+                open_record.rss_peak = max(open_record.rss_peak, peak)
+            reset_peak_rss()
+            self._open.append(record)
+        start = time.time()
+        rss_start = current_rss()
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield record
+        finally:
+            with self._lock:
+                self._open.remove(record)
+                record.rss_peak = max(record.rss_peak, peak_rss())
+            span = Span(
+                name=name,
+                start=start,
+                wall=time.perf_counter() - wall_start,
+                cpu=time.thread_time() - cpu_start,
+                bytes_read=record.bytes_read,
+                rss_start=rss_start,
+                rss_end=current_rss(),
+                rss_peak=record.rss_peak,
+                pid=os.getpid(),
+                tid=threading.get_ident(),
+                args=record.args,
+            )
+            with self._lock:
+                self.spans.append(span)
+
+    @property
+    def trace_file(self) -> Path:
+        return self.output_dir / f"trace_{socket.gethostname()}_{os.getpid()}.json"
+
+    def flush(self) -> None:
+        with self._lock:
+            spans = [s.model_dump() for s in self.spans]
+
+        atomic_write_json(self.trace_file, spans)
+
+
+@cache
+def get_profiler() -> Profiler | None:
+    """
+    Process wide profiler, enabled by setting LEPZOO_PROFILE_DIR (inherited by workers and
+    run-serial jobs). None when profiling is off.
+    """
+    if not os.environ.get("LEPZOO_PROFILE_DIR"):
+        return None
+
+    profiler = Profiler(Path(os.environ["LEPZOO_PROFILE_DIR"]))
+
+    import atexit
+
+    atexit.register(profiler.flush)
+    return profiler
+
+
+# a forked worker must not inherit (and re-write) the spans of its parent
+os.register_at_fork(after_in_child=get_profiler.cache_clear)
+
+
+def stage(name: str, **args: Any):
+    """
+    Time a stage if profiling is enabled, otherwise do nothing:
+
+        with stage("read", file=lfn) as record:
+            ...
+            if record is not None:
+                record.bytes_read += n
+    """
+    profiler = get_profiler()
+    if profiler is None:
+        return nullcontext()
+
+    return profiler.stage(name, **args)
+
+
+def flush_profile() -> None:
+    profiler = get_profiler()
+    if profiler is not None:
+        profiler.flush()
+
+
+def chrome_trace(spans: list[Span]) -> dict[str, Any]:
+    """
+    Spans in the Chrome trace event format (chrome://tracing, Perfetto).
+    """
+    return {
+        "traceEvents": [
+            {
+                "name": s.name,
+                "ph": "X",
+                "ts": s.start * 1e6,
+                "dur": s.wall * 1e6,
+                "pid": s.pid,
+                "tid": s.tid,
+                "args": {
+                    **s.args,
+                    "cpu_s": s.cpu,
+                    "bytes_read": s.bytes_read,
+                    "rss_start": s.rss_start,
+                    "rss_end": s.rss_end,
+                    "rss_peak": s.rss_peak,
+                },
+            }
+            for s in spans
+        ],
+        "displayTimeUnit": "ms",
+    }
+
+
+def summarize(spans: list[Span]) -> dict[str, dict[str, Any]]:
+    """
+    Per stage totals. A low cpu/wall ratio means the stage waits on I/O; a high one on a read
+    stage means it is bound by decompression. max_rss is the peak RSS during the stage,
+    max_rss_growth the largest increase of the peak RSS over the RSS at the start of one span.
+    """
+    summary: dict[str, dict[str, Any]] = {}
+    for s in spans:
+        stage_summary = summary.setdefault(
+            s.name,
+            {
+                "count": 0,
+                "wall": 0.0,
+                "cpu": 0.0,
+                "bytes_read": 0,
+                "max_rss": 0,
+                "max_rss_growth": 0,
+            },
+        )
+        stage_summary["count"] += 1
+        stage_summary["wall"] += s.wall
+        stage_summary["cpu"] += s.cpu
+        stage_summary["bytes_read"] += s.bytes_read
+        stage_summary["max_rss"] = max(stage_summary["max_rss"], s.rss_peak)
+        stage_summary["max_rss_growth"] = max(
+            stage_summary["max_rss_growth"], s.rss_peak - s.rss_start
+        )
+
+    for stage_summary in summary.values():
+        wall = stage_summary["wall"]
+        stage_summary["cpu_over_wall"] = stage_summary["cpu"] / wall if wall else 0.0
+        stage_summary["read_rate_MBps"] = (
+            stage_summary["bytes_read"] / wall / 1e6 if wall else 0.0
+        )
+
+    return summary
+
+
+def per_file(spans: list[Span]) -> dict[str, dict[str, dict[str, float]]]:
+    """
+    Wall/CPU time and bytes read of every stage, per file.
+    """
+    files: dict[str, dict[str, dict[str, float]]] = {}
+    for s in spans:
+        if "file" not in s.args:
+            continue
+        stage_totals = files.setdefault(s.args["file"], {}).setdefault(
+            s.name, {"wall": 0.0, "cpu": 0.0, "bytes_read": 0}
+        )
+        stage_totals["wall"] += s.wall
+        stage_totals["cpu"] += s.cpu
+        stage_totals["bytes_read"] += s.bytes_read
+
+    return files
+
+
+def aggregate_traces(profile_dir: Path) -> dict[str, dict[str, Any]]:
+    """
+    Merge the trace_*.json of all workers into profile_dir/profile.json (summary + per file) and
+    profile_dir/chrome_trace.json, print the per stage summary and return it.
+    """
+    spans: list[Span] = []
+    for trace_file in sorted(profile_dir.glob("trace_*.json")):
+        spans += [
+            Span.model_validate(s)
+            for s in json.loads(trace_file.read_text(encoding="utf-8"))
+        ]
+
+    summary = summarize(spans)
+    (profile_dir / "profile.json").write_text(
+        json.dumps({"stages": summary, "files": per_file(spans)}, indent=2),
+        encoding="utf-8",
+    )
+    (profile_dir / "chrome_trace.json").write_text(
+        json.dumps(chrome_trace(spans)), encoding="utf-8"
+    )
+
+    print(
+        f"{'stage':<20}{'count':>8}{'wall [s]':>12}{'cpu [s]':>12}{'cpu/wall':>10}{'MB read':>12}{'peak RSS [MB]':>15}{'RSS growth [MB]':>17}"
+    )
+    for name, s in summary.items():
+        print(
+            f"{name:<20}{s['count']:>8}{s['wall']:>12.2f}{s['cpu']:>12.2f}{s['cpu_over_wall']:>10.2f}{s['bytes_read'] / 1e6:>12.1f}{s['max_rss'] / 1e6:>15.1f}{s['max_rss_growth'] / 1e6:>17.1f}"
+        )
+
+    return summary
@@ -1,4 +1,20 @@
+import fcntl
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
 from enum import StrEnum
+from functools import cache
+from pathlib import Path
+from typing import Callable, TypeVar
+
+from .io import atomic_write_json
+
+T = TypeVar("T")
+
+DEFAULT_STATS_FILE = "redirector_stats.json"
+DEFAULT_TIMEOUT = 30.0
 
 
 class Redirectors(StrEnum):
@@ -6,3 +22,249 @@ class Redirectors(StrEnum):
     INFN = "root://xrootd-cms.infn.it//"
     CERN = "root://cms-xrd-global.cern.ch//"
     RWTH = "root://grid-dcache.physik.rwth-aachen.de//"
+
+
+class RedirectorStats:
+    """
+    Success/failure counts and total open latency of one redirector.
+    """
+
+    # prior for redirectors never tried: one success in PRIOR_LATENCY seconds, one failure
+    PRIOR_LATENCY = 1.0
+
+    def __init__(
+        self, successes: int = 0, failures: int = 0, latency: float = 0.0
+    ) -> None:
+        self.successes = successes
+        self.failures = failures
+        self.latency = latency
+
+    def success_rate(self) -> float:
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+    def mean_latency(self) -> float:
+        return (self.latency + self.PRIOR_LATENCY) / (self.successes + 1)
+
+    def expected_cost(self, timeout: float) -> float:
+        """
+        Expected time spent on this redirector: the open latency if it works, the timeout if not.
+        """
+        p = self.success_rate()
+        return p * self.mean_latency() + (1 - p) * timeout
+
+    def to_dict(self) -> dict[str, float]:
+        return {
+            "successes": self.successes,
+            "failures": self.failures,
+            "latency": self.latency,
+        }
+
+
+class RedirectorSelector:
+    """
+    Orders redirectors by expected cost, learned from previous attempts and persisted between
+    runs in stats_file.
+
+    Candidates can be any URL prefix (e.g. "file://" or a local test server) so the selection can
+    be exercised without the grid.
+    """
+
+    def __init__(
+        self,
+        candidates: list[str] | None = None,
+        stats_file: Path | None = Path(DEFAULT_STATS_FILE),
+        timeout: float = DEFAULT_TIMEOUT,
+        race: bool = False,
+    ) -> None:
+        self.candidates = (
+            [str(r) for r in Redirectors] if candidates is None else candidates
+        )
+        self.stats_file = stats_file
+        self.timeout = timeout
+        self.race = race
+        self.stats = {c: RedirectorStats() for c in self.candidates}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        if self.stats_file is None or not self.stats_file.exists():
+            return
+
+        saved = json.loads(self.stats_file.read_text())
+        for candidate, s in saved.items():
+            if candidate in self.stats:
+                self.stats[candidate] = RedirectorStats(**s)
+
+    def record(self, candidate: str, success: bool, latency: float) -> None:
+        """
+        Record one attempt, in memory and (merged with other processes) in stats_file.
+        """
+        delta = RedirectorStats(
+            int(success), int(not success), latency if success else 0.0
+        )
+        with self._lock:
+            s = self.stats[candidate]
+            s.successes += delta.successes
+            s.failures += delta.failures
+            s.latency += delta.latency
+
+            if self.stats_file is None:
+                return
+
+            lock_file = self.stats_file.with_name(f".{self.stats_file.name}.lock")
+            with lock_file.open("a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                saved = {}
+                if self.stats_file.exists():
+                    saved = json.loads(self.stats_file.read_text())
+                merged = RedirectorStats(**saved.get(candidate, {}))
+                merged.successes += delta.successes
+                merged.failures += delta.failures
+                merged.latency += delta.latency
+                saved[candidate] = merged.to_dict()
+
+                atomic_write_json(self.stats_file, saved, indent=2)
+
+    def ordered(self) -> list[str]:
+        """
+        Candidates sorted by expected cost (ties keep the configured order).
+        """
+        return sorted(
+            self.candidates, key=lambda c: self.stats[c].expected_cost(self.timeout)
+        )
+
+    def run(self, action: Callable[[str], T]) -> T:
+        """
+        Call action(redirector) on the redirectors, cheapest first, until one succeeds.
+
+        Each attempt is bounded by the timeout. With race=True the two cheapest candidates are
+        tried concurrently and the first success wins; the result of the other one, if it
+        succeeds too, is closed.
+        """
+        order = self.ordered()
+        n_first = 2 if self.race else 1
+        batches = [order[:n_first]] + [[c] for c in order[n_first:]]
+
+        errors = []
+        for batch in batches:
+            attempts = {
+                attempt.future: attempt
+                for attempt in (_Attempt(self, c, action) for c in batch)
+            }
+            deadline = time.perf_counter() + self.timeout
+            while attempts:
+                done, _ = wait(
+                    attempts,
+                    timeout=max(0.0, deadline - time.perf_counter()),
+                    return_when=FIRST_COMPLETED,
+                )
+                if not done:
+                    for attempt in attempts.values():
+                        errors.append(
+                            f"{attempt.candidate}: timeout after {self.timeout}s"
+                        )
+                        attempt.give_up()
+                    break
+
+                for fut in done:
+                    attempt = attempts.pop(fut)
+                    try:
+                        result = fut.result()
+                    except Exception as e:
+                        errors.append(f"{attempt.candidate}: {e}")
+                        continue
+                    for other in attempts.values():
+                        other.discard()
+                    return result
+
+        raise RuntimeError(
+            "File is not accessible by any redirector:\n" + "\n".join(errors)
+        )
+
+
+def _close(result: object) -> None:
+    # e.g. the uproot file opened by the attempt that lost the race
+    close = getattr(result, "close", None)
+    if callable(close):
+        close()
+
+
+class _Attempt:
+    """
+    One call of action on a candidate, in a daemon thread so an attempt that hangs past the
+    timeout is abandoned, not joined at exit. It is recorded exactly once: when it ends, or as a
+    failure when the selector gives up on it. A result nobody will use is closed.
+    """
+
+    def __init__(
+        self, selector: RedirectorSelector, candidate: str, action: Callable[[str], T]
+    ) -> None:
+        self.selector = selector
+        self.candidate = candidate
+        self.future: Future = Future()
+        self._lock = threading.Lock()
+        self._recorded = False
+        self._discarded = False
+        threading.Thread(target=self._run, args=(action,), daemon=True).start()
+
+    def _record(self, success: bool, latency: float) -> None:
+        with self._lock:
+            if self._recorded:
+                return
+            self._recorded = True
+        self.selector.record(self.candidate, success, latency)
+
+    def _run(self, action: Callable[[str], T]) -> None:
+        start = time.perf_counter()
+        try:
+            result = action(self.candidate)
+        except BaseException as e:
+            self._record(False, time.perf_counter() - start)
+            self.future.set_exception(e)
+            return
+
+        self._record(True, time.perf_counter() - start)
+        with self._lock:
+            if not self._discarded:
+                self.future.set_result(result)
+                return
+        _close(result)
+
+    def discard(self) -> None:
+        """
+        The result is not needed anymore: close it, now or when it arrives.
+        """
+        with self._lock:
+            self._discarded = True
+            if not self.future.done() or self.future.exception() is not None:
+                return
+        _close(self.future.result())
+
+    def give_up(self) -> None:
+        """
+        Count the attempt as a timeout (unless it just ended) and discard its result.
+        """
+        self._record(False, self.selector.timeout)
+        self.discard()
+
+
+@cache
+def get_selector() -> RedirectorSelector:
+    """
+    Process wide selector, configured by LEPZOO_REDIRECTORS (comma separated prefixes),
+    LEPZOO_REDIRECTOR_STATS, LEPZOO_REDIRECTOR_TIMEOUT and LEPZOO_REDIRECTOR_RACE.
+    """
+    candidates = None
+    if "LEPZOO_REDIRECTORS" in os.environ:
+        candidates = os.environ["LEPZOO_REDIRECTORS"].split(",")
+
+    return RedirectorSelector(
+        candidates,
+        Path(os.environ.get("LEPZOO_REDIRECTOR_STATS", DEFAULT_STATS_FILE)),
+        float(os.environ.get("LEPZOO_REDIRECTOR_TIMEOUT", DEFAULT_TIMEOUT)),
+        os.environ.get("LEPZOO_REDIRECTOR_RACE", "0") == "1",
+    )
+
+
+# the selector lock may be held by another thread at fork time
+os.register_at_fork(after_in_child=get_selector.cache_clear)
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import json
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+from pydantic import BaseModel
+
+from .io import atomic_path
+from .preselection import Preselection
+
+if TYPE_CHECKING:
+    from .event_classes import EventClasses
+
+# bump when the layout of the result files changes
+RESULT_FORMAT_VERSION = 3
+
+
+class ResultMetadata(BaseModel):
+    process_name: str
+    year: str
+    xsec: float
+    filter_eff: float
+    k_factor: float
+    n_events: int = 0
+    files: list[str] = []
+    # [lfn, entry start, entry stop] ranges classified (stop None: to the end of the file)
+    coverage: list[tuple[str, int, int | None]] = []
+    preselection: Preselection | None = None
+    # of the whole dataset, from the catalog
+    gen_event_sumw: float | None = None
+    # simulation weighted by genWeight * scale / gen_event_sumw (sumw is the yield per pb^-1),
+    # or data; False for simulation without generator sums, weighted by genWeight * scale
+    normalized: bool = False
+    format: int = RESULT_FORMAT_VERSION
+
+    @property
+    def scale(self) -> float:
+        return self.xsec * self.filter_eff * self.k_factor
+
+
+def result_group(process_name: str, year: str) -> str:
+    return f"{process_name}_{year}"
+
+
+def result_path(
+    results_dir: Path,
+    process_name: str,
+    year: str,
+    file_index: int,
+    entry_start: int | None = None,
+    entry_stop: int | None = None,
+    n_files: int = 1,
+) -> Path:
+    """
+    <file index>.npz for a whole file, <file index>_<entry start>-<entry stop>.npz for a range of
+    it (an open ended range has no stop), <first file index>-<last file index>.npz for a batch.
+    """
+    name = str(file_index)
+    if n_files > 1:
+        name += f"-{file_index + n_files - 1}"
+    if entry_start is not None or entry_stop is not None:
+        name += f"_{entry_start or 0}-{'' if entry_stop is None else entry_stop}"
+    return results_dir / result_group(process_name, year) / f"{name}.npz"
+
+
+def result_first_file_index(path: Path) -> int:
+    return int(path.stem.split("_")[0].split("-")[0])
+
+
+def result_unit(path: Path) -> tuple[range, int, int | None]:
+    """
+    File indexes and entry range of a result, from its name (see result_path).
+    """
+    files, _, entries = path.stem.partition("_")
+    first, _, last = files.partition("-")
+    start, _, stop = entries.partition("-")
+    return (
+        range(int(first), int(last or first) + 1),
+        int(start or 0),
+        int(stop) if stop else None,
+    )
+
+
+def _ranges_overlap(
+    start: int, stop: int | None, other_start: int, other_stop: int | None
+) -> bool:
+    return (other_stop is None or start < other_stop) and (
+        stop is None or other_start < stop
+    )
+
+
+def remove_stale_results(
+    results_dir: Path,
+    process_name: str,
+    year: str,
+    outputs: list[Path],
+    remove_all: bool = False,
+) -> None:
+    """
+    Remove the results of process/year left by a previous run that cover any of the entries
+    of outputs (all of them with remove_all), except outputs themselves: e.g. the ranges of a file
+    now processed whole, which would otherwise be merged with it.
+    """
+    ranges: dict[int, list[tuple[int, int | None]]] = {}
+    for output in outputs:
+        file_indexes, start, stop = result_unit(output)
+        for file_index in file_indexes:
+            ranges.setdefault(file_index, []).append((start, stop))
+
+    keep = set(outputs)
+    for old_result in (results_dir / result_group(process_name, year)).glob("*.npz"):
+        if old_result in keep:
+            continue
+        file_indexes, start, stop = result_unit(old_result)
+        if remove_all or any(
+            _ranges_overlap(start, stop, other_start, other_stop)
+            for file_index in file_indexes
+            for other_start, other_stop in ranges.get(file_index, [])
+        ):
+            old_result.unlink()
+
+
+def write_result(
+    event_classes: EventClasses, metadata: ResultMetadata, path: Path
+) -> None:
+    """
+    Store only the non-empty classes and bins, compressed. The file is renamed into place once
+    complete.
+    """
+    class_ids = np.flatnonzero(event_classes.counts)
+    arrays = {
+        "class_ids": class_ids,
+        "counts": event_classes.counts[class_ids],
+        "sumw": event_classes.sumw[class_ids],
+        "sumw2": event_classes.sumw2[class_ids],
+        "metadata": np.array(metadata.model_dump_json()),
+    }
+    for variable, histogram in event_classes.histograms.items():
+        arrays[f"{variable}/keys"] = histogram.keys
+        arrays[f"{variable}/sumw"] = histogram.sumw
+        arrays[f"{variable}/sumw2"] = histogram.sumw2
+
+    with atomic_path(path) as tmp_path, tmp_path.open("wb") as f:
+        np.savez_compressed(f, **arrays)
+
+
+def read_result(path: Path) -> tuple[EventClasses, ResultMetadata]:
+    # event_classes pulls in awkward/uproot/vector
+    from .event_classes import EventClasses, SparseHistogram
+
+    with np.load(path) as data:
+        metadata = ResultMetadata.model_validate(json.loads(str(data["metadata"])))
+        if metadata.format != RESULT_FORMAT_VERSION:
+            raise ValueError(
+                f"{path} has result format {metadata.format}, expected {RESULT_FORMAT_VERSION}"
+            )
+
+        event_classes = EventClasses()
+        class_ids = data["class_ids"]
+        event_classes.counts[class_ids] = data["counts"]
+        event_classes.sumw[class_ids] = data["sumw"]
+        event_classes.sumw2[class_ids] = data["sumw2"]
+        for variable in event_classes.histograms:
+            event_classes.histograms[variable] = SparseHistogram(
+                data[f"{variable}/keys"],
+                data[f"{variable}/sumw"],
+                data[f"{variable}/sumw2"],
+            )
+
+    return event_classes, metadata
+
+
+def _check_coverage(
+    path: Path,
+    coverage: list[tuple[str, int, int | None]],
+    merged_coverage: list[tuple[str, int, int | None]],
+) -> None:
+    merged_ranges: dict[str, list[tuple[int, int | None]]] = {}
+    for lfn, start, stop in merged_coverage:
+        merged_ranges.setdefault(lfn, []).append((start, stop))
+    for lfn, start, stop in coverage:
+        for other_start, other_stop in merged_ranges.get(lfn, []):
+            if _ranges_overlap(start, stop, other_start, other_stop):
+                raise ValueError(
+                    f"Can not merge {path}: entries [{start}, {stop}) of {lfn} are already in [{other_start}, {other_stop}) of another result, remove the stale results"
+                )
+
+
+def merge_results(paths: list[Path], output: Path) -> Path:
+    """
+    Sum result files of the same process/year into output. Files are read one at a time, so
+    memory holds two results at most whatever the number of files. Results covering the same
+    entries of a file are refused, they would be counted twice.
+    """
+    merged, merged_metadata = read_result(paths[0])
+    for path in paths[1:]:
+        event_classes, metadata = read_result(path)
+        if (metadata.process_name, metadata.year) != (
+            merged_metadata.process_name,
+            merged_metadata.year,
+        ):
+            raise ValueError(
+                f"Can not merge {path} ({metadata.process_name}, {metadata.year}) with {merged_metadata.process_name}, {merged_metadata.year}"
+            )
+        if metadata.preselection != merged_metadata.preselection:
+            raise ValueError(
+                f"Can not merge {path} ({metadata.preselection}) with results of another preselection ({merged_metadata.preselection})"
+            )
+        if metadata.normalized != merged_metadata.normalized:
+            raise ValueError(
+                f"Can not merge {path} with results of another normalization, was the catalog rebuilt with --gen-sums in between?"
+            )
+        _check_coverage(path, metadata.coverage, merged_metadata.coverage)
+        merged += event_classes
+        merged_metadata.n_events += metadata.n_events
+        # the ranges of a split file all list it
+        merged_metadata.files = list(
+            dict.fromkeys(merged_metadata.files + metadata.files)
+        )
+        merged_metadata.coverage += metadata.coverage
+
+    write_result(merged, merged_metadata, output)
+    return output
+
+
+def merge_all(
+    results_dir: Path,
+    output_dir: Path,
+    n_workers: int | None = None,
+    fan_in: int = 16,
+) -> dict[str, Path]:
+    """
+    Merge the per file results of every process/year under results_dir into
+    output_dir/<process>_<year>.npz, by tree reduction: each level merges groups of up to fan_in
+    files in parallel, until one file per process/year is left.
+    """
+    groups = {
+        group_dir.name: sorted(group_dir.glob("*.npz"))
+        for group_dir in sorted(results_dir.iterdir())
+        if group_dir.is_dir() and any(group_dir.glob("*.npz"))
+    }
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tmp_dir = output_dir / ".merge_tmp"
+    merged: dict[str, Path] = {}
+
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers) as ex:
+            level = 0
+            while groups:
+                futures = {}
+                for name, paths in groups.items():
+                    if len(paths) <= fan_in:
+                        output = output_dir / f"{name}.npz"
+                        futures[ex.submit(merge_results, paths, output)] = name
+                        continue
+
+                    for i in range(0, len(paths), fan_in):
+                        output = tmp_dir / str(level) / f"{name}.{i // fan_in}.npz"
+                        futures[
+                            ex.submit(merge_results, paths[i : i + fan_in], output)
+                        ] = name
+
+                next_groups: dict[str, list[Path]] = {}
+                for future in as_completed(futures):
+                    name = futures[future]
+                    output = future.result()
+                    if output.parent == output_dir:
+                        merged[name] = output
+                    else:
+                        next_groups.setdefault(name, []).append(output)
+
+                groups = {name: sorted(paths) for name, paths in next_groups.items()}
+                level += 1
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return merged
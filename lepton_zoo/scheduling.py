@@ -0,0 +1,229 @@
+import heapq
+import math
+import statistics
+from pathlib import Path
+from typing import Sequence, TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+
+class WorkUnit(BaseModel):
+    """
+    Files [file_index, file_index + n_files) of a dataset, or the [entry_start, entry_stop) range
+    of a single file, processed by one job.
+    """
+
+    file_index: int
+    n_files: int = 1
+    entry_start: int | None = None
+    entry_stop: int | None = None
+    cost: float
+
+
+def file_costs(
+    event_counts: Sequence[int | None], file_sizes: Sequence[int | None]
+) -> list[float]:
+    """
+    Expected processing cost of each file, in events: its number of events, else its size over
+    the bytes per event of the files where both are known, else the median cost of the others.
+    Without any event count, the costs are the sizes.
+    """
+    both = [(n, size) for n, size in zip(event_counts, file_sizes) if n and size]
+    if both:
+        bytes_per_event = sum(size for _, size in both) / sum(n for n, _ in both)
+    elif not any(event_counts):
+        bytes_per_event = 1.0
+    else:
+        bytes_per_event = None
+
+    costs: list[float | None] = []
+    for n, size in zip(event_counts, file_sizes):
+        if n:
+            costs.append(float(n))
+        elif size and bytes_per_event:
+            costs.append(size / bytes_per_event)
+        else:
+            costs.append(None)
+    known = [cost for cost in costs if cost is not None]
+    fallback = statistics.median(known) if known else 1.0
+    return [fallback if cost is None else cost for cost in costs]
+
+
+def split_entries(
+    n_events: int | None, events_per_unit: int | None
+) -> list[tuple[int | None, int | None]]:
+    """
+    Entry ranges of about events_per_unit events covering a file of n_events events. The last
+    range is open ended, so events DBS did not count are still processed. A file of unknown size
+    is a single unit.
+    """
+    if not n_events or not events_per_unit or n_events <= events_per_unit:
+        return [(None, None)]
+
+    n_units = math.ceil(n_events / events_per_unit)
+    bounds = [n_events * i // n_units for i in range(n_units)]
+    return [(start, stop) for start, stop in zip(bounds, bounds[1:])] + [
+        (bounds[-1], None)
+    ]
+
+
+def batch_files(
+    event_counts: Sequence[int | None],
+    file_sizes: Sequence[int | None],
+    max_events: int | None,
+    max_bytes: int | None,
+) -> list[list[int]]:
+    """
+    Group consecutive files (by position) into batches of at most max_events events and max_bytes
+    bytes. A file of unknown size, or above the limits, is alone in its batch. Without any limit
+    every file is its own batch.
+    """
+    batches: list[list[int]] = []
+    batch_events = batch_bytes = 0
+    # whether files can still be added to the last batch
+    open_batch = False
+    for i, (n_events, size) in enumerate(zip(event_counts, file_sizes)):
+        batchable = (max_events is not None or max_bytes is not None) and (
+            (max_events is None or n_events is not None)
+            and (max_bytes is None or size is not None)
+        )
+        if (
+            batchable
+            and open_batch
+            and (max_events is None or batch_events + (n_events or 0) <= max_events)
+            and (max_bytes is None or batch_bytes + (size or 0) <= max_bytes)
+        ):
+            batches[-1].append(i)
+            batch_events += n_events or 0
+            batch_bytes += size or 0
+            continue
+
+        batches.append([i])
+        batch_events = n_events or 0
+        batch_bytes = size or 0
+        open_batch = batchable
+
+    return batches
+
+
+def work_units(
+    n_lfns: int,
+    event_counts: Sequence[int] | None,
+    file_sizes: Sequence[int] | None,
+    events_per_unit: int | None = None,
+    batch_events: int | None = None,
+    batch_bytes: int | None = None,
+) -> list[WorkUnit]:
+    """
+    Work units covering the first n_lfns files of a dataset: files with more than events_per_unit
+    events are split in entry ranges, consecutive small files are batched up to batch_events
+    events and batch_bytes bytes.
+    """
+    counts = list(event_counts[:n_lfns]) if event_counts else [None] * n_lfns
+    sizes = list(file_sizes[:n_lfns]) if file_sizes else [None] * n_lfns
+
+    # files that will be split are never part of a batch
+    max_events = batch_events
+    if events_per_unit is not None and (
+        batch_events is not None or batch_bytes is not None
+    ):
+        max_events = (
+            events_per_unit
+            if batch_events is None
+            else min(batch_events, events_per_unit)
+        )
+
+    costs = file_costs(counts, sizes)
+    units = []
+    for batch in batch_files(counts, sizes, max_events, batch_bytes):
+        if len(batch) > 1:
+            units.append(
+                WorkUnit(
+                    file_index=batch[0],
+                    n_files=len(batch),
+                    cost=sum(costs[i] for i in batch),
+                )
+            )
+            continue
+
+        i = batch[0]
+        for start, stop in split_entries(counts[i], events_per_unit):
+            units.append(
+                WorkUnit(
+                    file_index=i,
+                    entry_start=start,
+                    entry_stop=stop,
+                    cost=(
+                        costs[i]
+                        if start is None
+                        else (counts[i] if stop is None else stop) - start
+                    ),
+                )
+            )
+
+    return units
+
+
+def lpt_order(items: Sequence[T], costs: Sequence[float]) -> list[T]:
+    """
+    Longest processing time first: a pool taking items in this order never ends with one long
+    file running alone while the other workers idle.
+    """
+    return [items[i] for i in sorted(range(len(items)), key=lambda i: -costs[i])]
+
+
+def predict_makespan(costs: Sequence[float], n_workers: int) -> float:
+    """
+    Completion time of the last item when n_workers take the items in order, each worker picking
+    the next one as soon as it is free.
+    """
+    finish_times = [0.0] * max(n_workers, 1)
+    for cost in costs:
+        heapq.heappush(finish_times, heapq.heappop(finish_times) + cost)
+    return max(finish_times)
+
+
+def read_joblog(joblog: Path) -> dict[int, tuple[float, float]]:
+    """
+    (start time, run time) of the last successful attempt of every job in a GNU parallel
+    compatible joblog.
+    """
+    jobs: dict[int, tuple[float, float]] = {}
+    with joblog.open("r", encoding="utf-8") as f:
+        next(f, None)
+        for line in f:
+            fields = line.split("\t")
+            if len(fields) < 9 or fields[6] != "0":
+                continue
+            jobs[int(fields[0])] = (float(fields[2]), float(fields[3]))
+    return jobs
+
+
+def makespan_report(
+    costs: dict[int, float], joblog: Path, n_workers: int
+) -> str | None:
+    """
+    Compare the actual makespan of a run with the one predicted from the costs of its jobs (keyed
+    by seq), converted to seconds with the average time per unit of cost measured in the run.
+    """
+    if not joblog.exists():
+        return None
+
+    jobs = read_joblog(joblog)
+    done = [seq for seq in costs if seq in jobs]
+    if not done:
+        return None
+
+    total_cost = sum(costs[seq] for seq in done)
+    total_time = sum(jobs[seq][1] for seq in done)
+    seconds_per_cost = total_time / total_cost if total_cost > 0 else 0.0
+
+    predicted = predict_makespan(
+        [costs[seq] * seconds_per_cost for seq in sorted(done)], n_workers
+    )
+    actual = max(jobs[seq][0] + jobs[seq][1] for seq in done) - min(
+        jobs[seq][0] for seq in done
+    )
+    return f"Makespan: predicted {predicted:.1f} s, actual {actual:.1f} s ({len(done)} jobs, {n_workers} workers, {total_time:.1f} s of work)"
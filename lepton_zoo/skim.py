@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+from functools import cached_property
+from pathlib import Path
+from typing import Any
+
+import awkward as ak
+
+from .io import atomic_path
+
+DEFAULT_SKIM_CACHE_DIR = "skim_cache"
+
+# bump when the layout of the skim files changes
+SKIM_FORMAT_VERSION = 1
+
+
+def skim_key(file_lfn: str, branches: list[str], nanoaod_version: str | None) -> str:
+    """
+    Identifies a skim: changing the LFN, the branch schema or the NanoAOD version invalidates it.
+    """
+    payload = json.dumps(
+        {
+            "lfn": file_lfn,
+            "branches": sorted(branches),
+            "nanoaod_version": nanoaod_version,
+            "format": SKIM_FORMAT_VERSION,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def skim_path(
+    file_lfn: str,
+    branches: list[str],
+    nanoaod_version: str | None,
+    cache_dir: Path | None = None,
+) -> Path:
+    if cache_dir is None:
+        cache_dir = Path(
+            os.environ.get("LEPZOO_SKIM_CACHE_DIR", DEFAULT_SKIM_CACHE_DIR)
+        )
+
+    name = file_lfn.strip("/").replace("/", "_").removesuffix(".root")
+    return cache_dir / f"{name}.{skim_key(file_lfn, branches, nanoaod_version)}.arrow"
+
+
+def write_skim(tree: Any, branches: list[str], path: Path, step_size: int) -> None:
+    """
+    Copy the branches of an uproot TTree to an uncompressed Arrow IPC file, one record batch per
+    step_size entries, so memory stays bounded. The file is renamed into place once complete.
+    """
+    import pyarrow as pa
+
+    writer = None
+    with atomic_path(path) as tmp_path:
+        for arrays in tree.iterate(branches, step_size=step_size):
+            table = ak.to_arrow_table(arrays, list_to32=True, extensionarray=False)
+            if writer is None:
+                writer = pa.ipc.new_file(str(tmp_path), table.schema)
+            writer.write_table(table)
+
+        if writer is None:
+            # empty tree: still write the schema
+            table = ak.to_arrow_table(
+                tree.arrays(branches, entry_stop=0),
+                list_to32=True,
+                extensionarray=False,
+            )
+            writer = pa.ipc.new_file(str(tmp_path), table.schema)
+        writer.close()
+
+
+class SkimTree:
+    """
+    Read-only stand-in for the uproot TTree interface used by Events, backed by a memory-mapped
+    Arrow IPC skim. Column reads are zero-copy slices of the mapped file.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.num_requested_bytes = 0
+
+    @cached_property
+    def _table(self) -> Any:
+        import pyarrow as pa
+
+        return pa.ipc.open_file(pa.memory_map(str(self.path), "r")).read_all()
+
+    def keys(self) -> list[str]:
+        return self._table.column_names
+
+    @property
+    def num_entries(self) -> int:
+        return self._table.num_rows
+
+    def arrays(
+        self,
+        branches: list[str],
+        entry_start: int | None = None,
+        entry_stop: int | None = None,
+    ) -> ak.Array:
+        start = 0 if entry_start is None else entry_start
+        stop = self.num_entries if entry_stop is None else entry_stop
+        table = self._table.select(branches).slice(start, max(stop - start, 0))
+        self.num_requested_bytes += table.nbytes
+
+        return ak.from_arrow(table)
@@ -1,5 +1,4 @@
 import importlib
-import json
 import os
 import subprocess as sp
 import sys
@@ -9,10 +8,11 @@ from pathlib import Path
 from typing import Literal, Sequence, Union
 
 import typer
-from rich.progress import track
 
 from lepton_zoo import Year
-from lepton_zoo.datasets import Dataset
+from lepton_zoo.catalog import catalog_path, open_catalog, write_catalog
+from lepton_zoo.executor import ParallelBackend, WorkItem, run_worker_pool
+from lepton_zoo.preselection import make_preselection
 
 StreamMode = Literal["auto", "lines", "chars"]
 
@@ -198,22 +198,50 @@ app.add_typer(plotter_app, name="plotter")
 @execution_time
 def build(
     inputs: Path = Path("datasets.py"),
+    probe_concurrency: int = typer.Option(
+        32, help="Number of files tested concurrently."
+    ),
+    probe_timeout: float = typer.Option(
+        120.0, help="Timeout (s) to test one file on all redirectors."
+    ),
+    refresh_dbs: bool = typer.Option(
+        False, help="Ignore the cached DBS listings and query DBS again."
+    ),
+    dbs_ttl: float = typer.Option(
+        24.0, help="Hours a cached DBS listing is considered fresh."
+    ),
+    gen_sums: bool = typer.Option(
+        True,
+        help="Read genEventSumw/genEventCount of the new simulation files from their Runs trees.",
+    ),
+    gen_sums_concurrency: int = typer.Option(
+        16, help="Number of Runs trees read concurrently."
+    ),
 ):
     """
     Build analysis config.
     """
+    # read by the Dataset validators while datasets.py is imported
+    os.environ["LEPZOO_PROBE_CONCURRENCY"] = str(probe_concurrency)
+    os.environ["LEPZOO_PROBE_TIMEOUT"] = str(probe_timeout)
+    os.environ["LEPZOO_DBS_REFRESH"] = "1" if refresh_dbs else "0"
+    os.environ["LEPZOO_DBS_TTL"] = str(dbs_ttl * 3600)
+    os.environ["LEPZOO_GEN_SUMS"] = "1" if gen_sums else "0"
+    os.environ["LEPZOO_GEN_SUMS_CONCURRENCY"] = str(gen_sums_concurrency)
 
     datasets = importlib.import_module(str(inputs).replace(".py", ""))
 
     from datasets import datasets
 
-    with Path("parsed_datasets.json").open("w", encoding="utf-8") as f:
-        json.dump(
-            [u.model_dump(mode="json") for u in datasets],
-            f,
-            ensure_ascii=False,
-            indent=2,
-        )
+    from lepton_zoo.io import atomic_write_json
+
+    atomic_write_json(
+        Path("parsed_datasets.json"),
+        [u.model_dump(mode="json") for u in datasets],
+        ensure_ascii=False,
+        indent=2,
+    )
+    write_catalog(datasets, catalog_path(Path("parsed_datasets.json")))
 
     print(f"Successfully Parsed and build datasets ...")
 
@@ -227,16 +255,97 @@ def list_processes(
     List parsed datasets.
     """
 
-    with parsed_datasets_file.open("r", encoding="utf-8") as f:
-        parsed_datasets = json.load(f)
-    parsed_datasets: list[Dataset] = [
-        Dataset.model_validate(obj) for obj in parsed_datasets
-    ]
-
-    for d in parsed_datasets:
+    for d in open_catalog(parsed_datasets_file).datasets():
         print(d.short_str())
 
 
+@app.command()
+def cache_stats():
+    """
+    Show NanoAOD cache usage and hit/miss/eviction statistics.
+    """
+    from lepton_zoo.cache import get_cache
+
+    cache = get_cache()
+    print(f"Files: {len(cache.entries())}")
+    print(f"Size: {cache.size() / 1e9:.2f} / {cache.max_size / 1e9:.2f} GB")
+    for field, value in cache.read_stats().model_dump().items():
+        print(f"{field}: {value}")
+
+
+def run_on_daemon(
+    catalog_file: Path, items: list[WorkItem], silence_mode: bool
+) -> bool:
+    """
+    Run the items on a `lepzoo daemon`, streaming its progress. False if no daemon is running,
+    or if it runs in another directory or with other LEPZOO_* settings than this shell.
+    """
+    from lepton_zoo.daemon import daemon_socket, submit
+
+    if not daemon_socket().exists():
+        return False
+    try:
+        messages = submit(catalog_file, items)
+    except OSError:
+        print(f"No lepzoo daemon on {daemon_socket()}, processing in this process")
+        return False
+
+    n_finished = 0
+    for message in messages:
+        match message["type"]:
+            case "item":
+                n_finished += 1
+                item = message["item"]
+                if not silence_mode:
+                    print(message["stdout"], end="")
+                status = "done" if message["exit_value"] == 0 else "FAILED"
+                print(
+                    f"[{n_finished}/{len(items)}] file {item['file_index']} of {item['process_name']} {item['year']} {status} in {message['run_time']:.1f} s"
+                )
+                if message["exit_value"] != 0:
+                    print(message["stderr"], end="")
+            case "done":
+                if message["failed"]:
+                    raise typer.Exit(1)
+            case "refused":
+                print(
+                    f"Not using the lepzoo daemon: {message['message']}, processing in this process"
+                )
+                return False
+            case "error":
+                raise RuntimeError(message["message"])
+
+    return True
+
+
+@app.command()
+def daemon(
+    n_workers: int | None = typer.Option(
+        None, help="Number of warm workers (default: number of CPUs)."
+    ),
+    parsed_datasets_file: Path = Path("parsed_datasets.json"),
+    stop: bool = typer.Option(False, "--stop", help="Stop the running daemon."),
+):
+    """
+    Serve run-serial jobs from warm workers on a local Unix socket ($LEPZOO_DAEMON_SOCKET).
+    """
+    from lepton_zoo import daemon as lepzoo_daemon
+
+    if stop:
+        if not lepzoo_daemon.stop():
+            print("No lepzoo daemon running")
+        return
+
+    catalog = (
+        open_catalog(parsed_datasets_file) if parsed_datasets_file.exists() else None
+    )
+    lepzoo_daemon.serve(
+        lepzoo_daemon.daemon_socket(),
+        n_workers,
+        catalog.path if catalog is not None else None,
+    )
+
+
 @classification_app.command()
 @execution_time
 def run_serial(
@@ -244,44 +353,233 @@ def run_serial(
     year: Year,
     max_files: int = -1,
     file_index: int | None = None,
+    entry_start: int | None = typer.Option(
+        None, help="With --file-index, only process entries from this one on."
+    ),
+    entry_stop: int | None = typer.Option(
+        None, help="With --file-index, only process entries before this one."
+    ),
+    n_files: int = typer.Option(
+        1, help="With --file-index, process this many consecutive files as one job."
+    ),
     parsed_datasets_file: Path = Path("parsed_datasets.json"),
     silence_mode: bool = False,
     enable_cache: bool = False,
+    enable_skim_cache: bool = typer.Option(
+        False, help="Read from (and fill) a local Arrow skim of the branches used."
+    ),
+    cache_max_size: str | None = typer.Option(
+        None,
+        help="Maximum size of the NanoAOD cache, LRU evicted (default: $LEPZOO_CACHE_MAX_SIZE or 100GB).",
+    ),
+    step_size: int = typer.Option(
+        100_000, help="Number of entries read per chunk (bounds memory usage)."
+    ),
+    prefetch_depth: int = typer.Option(
+        2, help="Files downloaded ahead of processing with --enable-cache (0: off)."
+    ),
+    profile_dir: Path | None = typer.Option(
+        None,
+        help="Record per stage timings, bytes read and RSS to this directory.",
+    ),
+    results_dir: Path = typer.Option(
+        Path("classification_results"),
+        help="Per file classification results go to <results-dir>/<process>_<year>/<file index>.npz.",
+    ),
+    use_daemon: bool = typer.Option(
+        False,
+        "--daemon/--no-daemon",
+        help="Submit the files to a running `lepzoo daemon` started from the same directory with the same LEPZOO_* settings (ignored with --cache-max-size or --profile-dir).",
+    ),
+    min_muons: int = typer.Option(
+        0, help="Preselection: only read events with at least this many muons (nMuon)."
+    ),
+    min_electrons: int = typer.Option(
+        0,
+        help="Preselection: only read events with at least this many electrons (nElectron).",
+    ),
+    min_leptons: int = typer.Option(
+        0,
+        help="Preselection: only read events with at least this many muons + electrons.",
+    ),
+    triggers: str | None = typer.Option(
+        None,
+        help="Preselection: only read events firing any of these comma separated trigger bits (e.g. HLT_IsoMu24).",
+    ),
 ):
     """
     Run selection and classification.
     """
+    from lepton_zoo.results import remove_stale_results, result_path
+
+    catalog = open_catalog(parsed_datasets_file)
+    preselection = make_preselection(min_muons, min_electrons, min_leptons, triggers)
+
+    if (process_name, year) in catalog:
+        if file_index is None:
+            n_lfns = catalog.n_lfns(process_name, year)
+            units = [
+                (i, 1, None, None)
+                for i in range(n_lfns if max_files <= 0 else min(n_lfns, max_files))
+            ]
+        else:
+            units = [(file_index, n_files, entry_start, entry_stop)]
+
+        # results of a previous run covering the same entries (e.g. split or batched
+        # differently) would be merged with the new ones
+        remove_stale_results(
+            results_dir,
+            process_name,
+            year,
+            [
+                result_path(results_dir, process_name, year, i, start, stop, n)
+                for i, n, start, stop in units
+            ],
+        )
+
+    if (
+        use_daemon
+        and cache_max_size is None
+        and profile_dir is None
+        and (process_name, year) in catalog
+    ):
+        items = [
+            WorkItem(
+                seq=seq,
+                process_name=process_name,
+                year=year,
+                file_index=i,
+                n_files=n,
+                entry_start=start,
+                entry_stop=stop,
+                enable_cache=enable_cache,
+                enable_skim_cache=enable_skim_cache,
+                step_size=step_size,
+                prefetch_depth=prefetch_depth,
+                results_dir=results_dir.absolute(),
+                preselection=preselection,
+                silence_mode=silence_mode,
+            )
+            for seq, (i, n, start, stop) in enumerate(units, start=1)
+        ]
+        if run_on_daemon(catalog.path, items, silence_mode):
+            return
+
+    from rich.progress import track
+
     from lepton_zoo import run_classification
+    from lepton_zoo.manifest import JobManifest, config_hash
 
-    with parsed_datasets_file.open("r", encoding="utf-8") as f:
-        parsed_datasets: list[Dataset] = json.load(f)
-    parsed_datasets: list[Dataset] = [
-        Dataset.model_validate(obj) for obj in parsed_datasets
-    ]
-
-    if enable_cache:
-        os.system("mkdir -p nanoaod_files_cache")
-
-    for dataset in parsed_datasets:
-        if dataset.process_name == process_name and dataset.year == year:
-            assert dataset.lfns is not None
-            match file_index:
-                case None:
-                    for i, _ in enumerate(
-                        track(
-                            dataset.lfns,
-                            description=f"Processing {dataset.short_str()} ...",
-                            total=len(dataset.lfns),
-                        )
-                    ):
-                        if max_files <= 0 or (max_files > 0 and i + 1 <= max_files):
-                            run_classification(i, dataset, silence_mode, enable_cache)
-                case int():
-                    if not silence_mode:
-                        print(
-                            f"Processing {dataset.lfns[file_index]} of {dataset.short_str()} ..."
-                        )
-                    run_classification(file_index, dataset, silence_mode, enable_cache)
+    manifest = JobManifest(results_dir)
+
+    if cache_max_size is not None:
+        os.environ["LEPZOO_CACHE_MAX_SIZE"] = cache_max_size
+
+    if profile_dir is not None:
+        os.environ["LEPZOO_PROFILE_DIR"] = str(profile_dir)
+
+    if (process_name, year) in catalog:
+        match file_index:
+            case None:
+                dataset = catalog.dataset(process_name, year, with_lfns=True)
+                assert dataset.lfns is not None
+                lfns = dataset.lfns if max_files <= 0 else dataset.lfns[:max_files]
+                config = config_hash(dataset, preselection)
+                if enable_cache:
+                    from lepton_zoo.cache import get_cache
+
+                    get_cache().add_known_sizes(lfns, dataset.file_sizes)
+
+                # download the next files while the current one is processed
+                prefetcher = None
+                if enable_cache and prefetch_depth > 0:
+                    from lepton_zoo.prefetch import Prefetcher
+
+                    prefetcher = Prefetcher(lfns, prefetch_depth)
+
+                for i, lfn in enumerate(
+                    track(
+                        prefetcher if prefetcher is not None else lfns,
+                        description=f"Processing {dataset.short_str()} ...",
+                        total=len(lfns),
+                    )
+                ):
+                    output_file = result_path(results_dir, process_name, year, i)
+                    run_classification(
+                        lfn,
+                        dataset,
+                        silence_mode,
+                        enable_cache,
+                        step_size,
+                        enable_skim_cache,
+                        output_file,
+                        preselection=preselection,
+                    )
+                    manifest.record(
+                        dataset,
+                        lfn,
+                        output_file,
+                        preselection=preselection,
+                        config=config,
+                    )
+
+                if prefetcher is not None:
+                    print(prefetcher.report())
+            case int():
+                dataset = catalog.dataset(process_name, year)
+                lfns = [
+                    catalog.lfn(process_name, year, i)
+                    for i in range(file_index, file_index + n_files)
+                ]
+                if enable_cache:
+                    from lepton_zoo.cache import get_cache
+
+                    file_sizes = catalog.file_column(process_name, year, "file_sizes")
+                    get_cache().add_known_sizes(
+                        lfns,
+                        file_sizes and file_sizes[file_index : file_index + n_files],
+                    )
+                if not silence_mode:
+                    print(f"Processing {', '.join(lfns)} of {dataset.short_str()} ...")
+                output_file = result_path(
+                    results_dir,
+                    process_name,
+                    year,
+                    file_index,
+                    entry_start,
+                    entry_stop,
+                    n_files,
+                )
+                run_classification(
+                    lfns,
+                    dataset,
+                    silence_mode,
+                    enable_cache,
+                    step_size,
+                    enable_skim_cache,
+                    output_file,
+                    entry_start,
+                    entry_stop,
+                    preselection,
+                    prefetch_depth,
+                )
+                config = config_hash(dataset, preselection)
+                for lfn in lfns:
+                    manifest.record(
+                        dataset,
+                        lfn,
+                        output_file,
+                        entry_start,
+                        entry_stop,
+                        preselection,
+                        config,
+                    )
+
+    if profile_dir is not None:
+        from lepton_zoo.profiling import aggregate_traces, flush_profile
+
+        flush_profile()
+        aggregate_traces(profile_dir)
 
 
 @classification_app.command()
@@ -291,43 +589,278 @@ def run_parallel(
     year: Year | None = None,
     max_files: int = -1,
     parsed_datasets_file: Path = Path("parsed_datasets.json"),
+    backend: ParallelBackend = typer.Option(
+        ParallelBackend.GNU_PARALLEL,
+        help="GNU parallel (one process per file) or a native pool of warm workers.",
+    ),
+    n_workers: int | None = typer.Option(
+        None, help="Number of native workers (default: number of CPUs)."
+    ),
+    enable_cache: bool = False,
+    enable_skim_cache: bool = typer.Option(
+        False, help="Read from (and fill) a local Arrow skim of the branches used."
+    ),
+    cache_max_size: str | None = typer.Option(
+        None,
+        help="Maximum size of the NanoAOD cache, LRU evicted (default: $LEPZOO_CACHE_MAX_SIZE or 100GB).",
+    ),
+    prefetch_depth: int = typer.Option(
+        2,
+        help="Files of a batch downloaded ahead of processing with --enable-cache (0: off).",
+    ),
+    profile_dir: Path | None = typer.Option(
+        None,
+        help="Record per stage timings, bytes read and RSS to this directory.",
+    ),
+    results_dir: Path = typer.Option(
+        Path("classification_results"),
+        help="Per file classification results go to <results-dir>/<process>_<year>/<file index>.npz.",
+    ),
+    resume: bool = typer.Option(
+        False,
+        help="Keep previous results and only process the files without an up to date one.",
+    ),
+    events_per_unit: int | None = typer.Option(
+        None,
+        help="Split files with more events (according to DBS) into entry ranges of about this size.",
+    ),
+    batch_events: int | None = typer.Option(
+        None,
+        help="Process consecutive small files together, up to this many events (according to DBS) per job.",
+    ),
+    batch_bytes: int | None = typer.Option(
+        None,
+        help="Process consecutive small files together, up to this many bytes per job.",
+    ),
+    min_muons: int = typer.Option(
+        0, help="Preselection: only read events with at least this many muons (nMuon)."
+    ),
+    min_electrons: int = typer.Option(
+        0,
+        help="Preselection: only read events with at least this many electrons (nElectron).",
+    ),
+    min_leptons: int = typer.Option(
+        0,
+        help="Preselection: only read events with at least this many muons + electrons.",
+    ),
+    triggers: str | None = typer.Option(
+        None,
+        help="Preselection: only read events firing any of these comma separated trigger bits (e.g. HLT_IsoMu24).",
+    ),
 ):
     """
     Run selection and classification.
     """
+    from lepton_zoo.manifest import JobManifest, config_hash
+    from lepton_zoo.results import remove_stale_results, result_group, result_path
+    from lepton_zoo.scheduling import (
+        lpt_order,
+        makespan_report,
+        predict_makespan,
+        work_units,
+    )
 
-    with parsed_datasets_file.open("r", encoding="utf-8") as f:
-        parsed_datasets: list[Dataset] = json.load(f)
-    parsed_datasets: list[Dataset] = [
-        Dataset.model_validate(obj) for obj in parsed_datasets
-    ]
-
-    cmds: list[str] = []
-    for dataset in parsed_datasets:
-        if dataset.process_name == process_name or process_name is None:
-            if dataset.year == year or year is None:
-                assert dataset.lfns is not None
-                for i, _ in enumerate(dataset.lfns):
-                    if max_files <= 0 or (max_files > 0 and i + 1 <= max_files):
-                        cmds.append(
-                            f"lepzoo classification run-serial {dataset.process_name} {dataset.year} --file-index {i} --silence-mode"
+    catalog = open_catalog(parsed_datasets_file)
+    preselection = make_preselection(min_muons, min_electrons, min_leptons, triggers)
+    manifest = JobManifest(results_dir)
+    n_done = 0
+
+    items: list[WorkItem] = []
+    costs: list[float] = []
+    expected_outputs: set[Path] = set()
+    for _process_name, _year in catalog.keys():
+        if _process_name == process_name or process_name is None:
+            if _year == year or year is None:
+                dataset = catalog.dataset(_process_name, _year)
+                # the same for all the files of the dataset, only needed to resume
+                config = config_hash(dataset, preselection) if resume else None
+                n_lfns = catalog.n_lfns(_process_name, _year)
+                if max_files > 0:
+                    n_lfns = min(n_lfns, max_files)
+                for unit in work_units(
+                    n_lfns,
+                    catalog.file_column(_process_name, _year, "event_counts"),
+                    catalog.file_column(_process_name, _year, "file_sizes"),
+                    events_per_unit,
+                    batch_events,
+                    batch_bytes,
+                ):
+                    output_file = result_path(
+                        results_dir,
+                        _process_name,
+                        _year,
+                        unit.file_index,
+                        unit.entry_start,
+                        unit.entry_stop,
+                        unit.n_files,
+                    )
+                    expected_outputs.add(output_file)
+                    if resume and all(
+                        manifest.is_complete(
+                            dataset,
+                            catalog.lfn(_process_name, _year, i),
+                            output_file,
+                            unit.entry_start,
+                            unit.entry_stop,
+                            preselection,
+                            config,
                         )
-
-    Path("cmds.txt").write_text("\n".join(cmds) + "\n", encoding="utf-8")
-
-    cmd = "parallel --results parallel_outputs --bar --retries 3 --halt soon,fail=1 --joblog joblog.tsv < cmds.txt"
+                        for i in range(unit.file_index, unit.file_index + unit.n_files)
+                    ):
+                        n_done += 1
+                        continue
+                    items.append(
+                        WorkItem(
+                            seq=len(items) + 1,
+                            process_name=_process_name,
+                            year=Year(_year),
+                            file_index=unit.file_index,
+                            n_files=unit.n_files,
+                            entry_start=unit.entry_start,
+                            entry_stop=unit.entry_stop,
+                            enable_cache=enable_cache,
+                            enable_skim_cache=enable_skim_cache,
+                            prefetch_depth=prefetch_depth,
+                            results_dir=results_dir,
+                            preselection=preselection,
+                        )
+                    )
+                    costs.append(unit.cost)
+
+    # largest work units first, across all the selected datasets
+    n_slots = n_workers or os.cpu_count() or 1
+    in_order_makespan = predict_makespan(costs, n_slots)
+    scheduled = lpt_order(list(zip(items, costs)), costs)
+    items = [item for item, _ in scheduled]
+    costs = [cost for _, cost in scheduled]
+    for seq, item in enumerate(items, start=1):
+        item.seq = seq
+    if items:
+        print(
+            f"Predicted makespan: {predict_makespan(costs, n_slots):.3g} largest files first, {in_order_makespan:.3g} in catalog order (in events, or bytes without DBS event counts)"
+        )
 
     os.system("rm -rf parallel_outputs")
     os.system("mkdir -p parallel_outputs")
 
-    rc = run_stream_shell(
-        cmd,
-        merge_stderr=True,  # show the --bar progress
-        stream_mode="auto",  # auto picks "chars" when merge_stderr=True
-        shell_exe="/bin/bash",  # ensure bash features if you use them
-    )
+    if resume:
+        print(f"Resuming: {n_done} work units already done, {len(items)} to process")
+
+    # results left by a previous run of the same processes would be merged with the new ones (with
+    # --resume, only those covering the entries of another unit, e.g. split differently)
+    for _process_name, _year in {(item.process_name, item.year) for item in items}:
+        remove_stale_results(
+            results_dir,
+            _process_name,
+            _year,
+            [
+                output
+                for output in expected_outputs
+                if output.parent.name == result_group(_process_name, _year)
+            ],
+            remove_all=not resume,
+        )
+
+    if cache_max_size is not None:
+        # inherited by the workers / run-serial jobs
+        os.environ["LEPZOO_CACHE_MAX_SIZE"] = cache_max_size
+
+    if profile_dir is not None:
+        for trace_file in profile_dir.glob("trace_*.json"):
+            trace_file.unlink()
+        os.environ["LEPZOO_PROFILE_DIR"] = str(profile_dir)
+
+    match backend:
+        case ParallelBackend.GNU_PARALLEL:
+            Path("cmds.txt").write_text(
+                "\n".join(item.command(parsed_datasets_file) for item in items) + "\n",
+                encoding="utf-8",
+            )
+
+            cmd = "parallel --results parallel_outputs --bar --retries 3 --halt soon,fail=1 --joblog joblog.tsv < cmds.txt"
+
+            rc = run_stream_shell(
+                cmd,
+                merge_stderr=True,  # show the --bar progress
+                stream_mode="auto",  # auto picks "chars" when merge_stderr=True
+                shell_exe="/bin/bash",  # ensure bash features if you use them
+            )
+        case ParallelBackend.NATIVE:
+            rc = run_worker_pool(
+                items,
+                catalog.path,
+                n_workers=n_workers,
+                retries=3,
+                halt_on_failure=True,
+                results_dir=Path("parallel_outputs"),
+                joblog=Path("joblog.tsv"),
+            )
     print(f"\n[exit code: {rc}]")
 
+    report = makespan_report(
+        {item.seq: cost for item, cost in zip(items, costs)},
+        Path("joblog.tsv"),
+        n_slots,
+    )
+    if report is not None:
+        print(report)
+
+    if profile_dir is not None:
+        from lepton_zoo.profiling import aggregate_traces
+
+        aggregate_traces(profile_dir)
+
+
+@app.command()
+@execution_time
+def merge(
+    results_dir: Path = typer.Option(
+        Path("classification_results"), help="Per file classification results."
+    ),
+    output_dir: Path = typer.Option(
+        Path("merged_results"), help="One merged <process>_<year>.npz per process/year."
+    ),
+    n_workers: int | None = typer.Option(
+        None, help="Number of merge processes (default: number of CPUs)."
+    ),
+    fan_in: int = typer.Option(16, help="Files merged together at each tree level."),
+):
+    """
+    Merge classification results by tree reduction.
+    """
+    from lepton_zoo.results import merge_all
+
+    merged = merge_all(results_dir, output_dir, n_workers, fan_in)
+    for name, path in sorted(merged.items()):
+        print(f"{name}: {path}")
+
+
+@app.command()
+@execution_time
+def dedup_index(
+    process_name: str,
+    year: Year,
+    parsed_datasets_file: Path = Path("parsed_datasets.json"),
+    n_workers: int | None = typer.Option(
+        None, help="Number of indexing processes (default: number of CPUs)."
+    ),
+    enable_cache: bool = False,
+):
+    """
+    Index the (run, luminosityBlock, event) of a dataset into $LEPZOO_DEDUP_DIR, so datasets
+    listing it in remove_overlap_with drop its events.
+    """
+    from lepton_zoo.duplicates import build_index, index_path
+
+    catalog = open_catalog(parsed_datasets_file)
+    path = index_path(process_name, year)
+    summary = build_index(
+        path, catalog.lfns(process_name, year), n_workers, enable_cache
+    )
+    print(
+        f"{path}: {summary['n_keys']} events from {summary['n_files']} files ({summary['n_events'] - summary['n_keys']} duplicates within the dataset)"
+    )
+
 
 @plotter_app.command()
 @execution_time